@@ -5,6 +5,7 @@
 """
 import sys
 import os
+import multiprocessing
 from pathlib import Path
 
 from PyQt6.QtWidgets import QApplication, QSplashScreen
@@ -15,6 +16,7 @@ from qfluentwidgets import setTheme, Theme, SplashScreen
 
 # 导入自定义模块
 from src.config import ConfigManager
+from src.core.executor import shutdown_executors
 from src.ui import CryptoTab, ImageTab, SettingsTab
 
 
@@ -107,6 +109,8 @@ class MainWindow(FluentWindow):
         """窗口关闭事件处理"""
         # 保存配置
         self.settings_tab.save_config()
+        # 关闭后台线程池，不等待正在执行的任务
+        shutdown_executors(wait=False)
         super().closeEvent(event)
 
 
@@ -153,4 +157,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包后的程序使用进程池时需要
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,284 @@
+"""
+命令行入口，不依赖图形界面，用于在没有显示环境的机器上批量解密、加密和处理图像
+
+用法:
+    python -m src.cli decrypt <资源目录> [--output-dir 输出目录]
+    python -m src.cli encode <资源目录> [--index 索引文件] [--verify]
+    python -m src.cli verify <资源目录> [--index 索引文件]
+    python -m src.cli premultiply <图像文件或目录>... [--output-dir 输出目录]
+    python -m src.cli straighten <图像文件或目录>... [--output-dir 输出目录]
+
+使用--json时每行输出一个JSON对象: {"event": "log"|"progress"|"result", ...}，
+所有文件处理成功时退出码为0，有文件处理失败时为1，无法开始处理时为2
+"""
+import argparse
+import re
+import sys
+import threading
+from pathlib import Path
+
+import ujson
+
+from src.core.crypto import IO_MODE_MEMORY, IO_MODES, decrypt, encode
+from src.core.executor import BACKEND_AUTO, BACKENDS, shutdown_executors
+from src.core.file_filter import FileFilter
+from src.core.index_store import IndexStore
+from src.core.verify import RESULT_MISMATCHED, RESULT_MISSING, verify
+
+# 退出码
+EXIT_OK = 0      # 所有文件处理成功
+EXIT_FAILED = 1  # 有文件处理失败或校验不一致
+EXIT_ERROR = 2   # 参数错误、目录不存在等原因无法开始处理
+
+# 图像命令处理目录时包含的文件后缀
+IMAGE_SUFFIXES = (".png",)
+
+# 从日志消息中识别进度
+_PROGRESS_PATTERN = re.compile(r"进度: (\d+)% \((\d+)/(\d+)\)")
+_STREAMING_PROGRESS_PATTERN = re.compile(r"进度: 已(?:处理|分类) (\d+) 个文件")
+
+
+class _Output:
+    """
+    命令行输出，文本模式下原样输出日志，JSON模式下每条消息输出为一行JSON
+
+    日志回调可能在多个线程中调用，输出时加锁避免行交错
+    """
+
+    def __init__(self, json_mode):
+        self.json_mode = json_mode
+        self._lock = threading.Lock()
+
+    def _emit(self, event):
+        line = ujson.dumps(event, ensure_ascii=False, escape_forward_slashes=False)
+        with self._lock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    def log(self, message):
+        """日志回调函数"""
+        if not self.json_mode:
+            with self._lock:
+                print(message, flush=True)
+            return
+        match = _PROGRESS_PATTERN.search(message)
+        if match:
+            percent, done, total = map(int, match.groups())
+            self._emit({"event": "progress", "percent": percent, "done": done, "total": total})
+            return
+        match = _STREAMING_PROGRESS_PATTERN.search(message)
+        if match:
+            self._emit({"event": "progress", "percent": None, "done": int(match.group(1)), "total": None})
+            return
+        message = message.strip()
+        if message:
+            self._emit({"event": "log", "message": message})
+
+    def result(self, command, exit_code, stats):
+        """输出最终结果，文本模式下统计信息已由日志输出"""
+        if self.json_mode:
+            self._emit({"event": "result", "command": command, "ok": exit_code == EXIT_OK,
+                        "exit_code": exit_code, "stats": stats})
+
+
+def _file_filter(args):
+    """根据命令行参数创建文件筛选规则，没有设置规则时返回None"""
+    if not (args.include or args.exclude):
+        return None
+    return FileFilter(include=args.include, exclude=args.exclude)
+
+
+def _concurrency(args):
+    return {
+        "backend": args.backend,
+        "batch_size": args.batch_size,
+        "max_workers": args.workers,
+        "queue_depth": args.queue_depth,
+    }
+
+
+def _resolve_index(args, directory, output):
+    """获取索引文件，未指定时使用目录最新的索引快照"""
+    if args.index:
+        return Path(args.index)
+    index_file = IndexStore().latest(directory)
+    if index_file is None:
+        output.log(f"错误: 没有找到目录 {directory} 的索引快照，请使用--index指定索引文件\n")
+    return index_file
+
+
+def _run_decrypt(args, output):
+    stats = decrypt(
+        Path(args.directory), output.log, mode=args.mode, resume=not args.no_resume,
+        incremental=not args.full, file_filter=_file_filter(args), export_json=args.export_json,
+        output_dir=args.output_dir, **_concurrency(args)
+    )
+    if stats is None:
+        return EXIT_ERROR, None
+    return (EXIT_FAILED if stats["failed"] else EXIT_OK), stats
+
+
+def _run_encode(args, output):
+    directory = Path(args.directory)
+    index_file = _resolve_index(args, directory, output)
+    if index_file is None:
+        return EXIT_ERROR, None
+    stats = encode(
+        directory, index_file, output.log, mode=args.mode, resume=not args.no_resume,
+        file_filter=_file_filter(args), verify=args.verify, output_dir=args.output_dir, **_concurrency(args)
+    )
+    if stats is None:
+        return EXIT_ERROR, None
+    return (EXIT_FAILED if stats["failed"] or stats["mismatched"] else EXIT_OK), stats
+
+
+def _run_verify(args, output):
+    directory = Path(args.directory)
+    index_file = _resolve_index(args, directory, output)
+    if index_file is None:
+        return EXIT_ERROR, None
+    result = verify(directory, index_file, output.log, file_filter=_file_filter(args), **_concurrency(args))
+    if result is None:
+        return EXIT_ERROR, None
+    failed = result[RESULT_MISMATCHED] or result[RESULT_MISSING]
+    return (EXIT_FAILED if failed else EXIT_OK), result
+
+
+def _collect_images(paths):
+    """展开命令行中的图像文件和目录"""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(file for file in path.iterdir() if file.suffix.lower() in IMAGE_SUFFIXES))
+        else:
+            files.append(path)
+    return files
+
+
+def _run_images(args, output):
+    # 图像处理依赖PIL和numpy，只在处理图像时导入
+    from src.core.image_processor import batch_process_images, premultiply_alpha, straight_alpha
+    conversion_function = premultiply_alpha if args.command == "premultiply" else straight_alpha
+    files = _collect_images(args.paths)
+    missing = [file for file in files if not file.is_file()]
+    if missing:
+        for file in missing:
+            output.log(f"错误: 文件 {file} 不存在\n")
+        return EXIT_ERROR, None
+    if not files:
+        output.log("未找到需要处理的图像文件\n")
+        return EXIT_OK, {"successful": 0, "failed": 0}
+    options = {"backend": args.backend, "max_workers": args.workers}
+    if args.memory_limit:
+        options["memory_limit"] = args.memory_limit * 1024 * 1024
+    if args.strip_pixels:
+        options["strip_pixels"] = args.strip_pixels
+    successful = batch_process_images(files, conversion_function, output.log, output_dir=args.output_dir, **options)
+    stats = {"successful": successful, "failed": len(files) - successful}
+    return (EXIT_FAILED if stats["failed"] else EXIT_OK), stats
+
+
+def _positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"必须为正整数: {value}")
+    return number
+
+
+def build_parser():
+    """
+    创建命令行参数解析器
+
+    Returns:
+        argparse.ArgumentParser: 参数解析器
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", help="每行输出一个JSON对象，便于其他程序解析")
+
+    concurrency = argparse.ArgumentParser(add_help=False)
+    concurrency.add_argument("--workers", type=_positive_int, help="工作者数量，默认根据CPU核心数设置")
+    concurrency.add_argument("--backend", choices=BACKENDS, default=BACKEND_AUTO, help="执行后端")
+    concurrency.add_argument("--batch-size", type=_positive_int, help="每批提交的文件数量")
+    concurrency.add_argument("--queue-depth", type=_positive_int, help="同时提交的最大批次数")
+
+    selection = argparse.ArgumentParser(add_help=False)
+    selection.add_argument("directory", help="游戏资源目录")
+    selection.add_argument("--include", action="append", default=[], help="包含规则（glob或re:正则），可重复")
+    selection.add_argument("--exclude", action="append", default=[], help="排除规则（glob或re:正则），可重复")
+
+    crypto = argparse.ArgumentParser(add_help=False)
+    crypto.add_argument("--mode", choices=IO_MODES, default=IO_MODE_MEMORY, help="读写模式")
+    crypto.add_argument("--output-dir", type=Path, help="输出目录，设置时原目录保持不变")
+    crypto.add_argument("--no-resume", action="store_true", help="不跳过上次中断的运行中已完成的文件")
+
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="交错战线 Assets 工具命令行")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    decrypt_parser = subparsers.add_parser(
+        "decrypt", parents=[common, selection, crypto, concurrency], help="解密目录下的资源文件"
+    )
+    decrypt_parser.add_argument("--full", action="store_true", help="忽略文件指纹，重新处理所有文件")
+    decrypt_parser.add_argument("--export-json", action="store_true", help="同时将目录索引导出为JSON")
+
+    encode_parser = subparsers.add_parser(
+        "encode", parents=[common, selection, crypto, concurrency], help="加密目录下的资源文件"
+    )
+    encode_parser.add_argument("--index", help="目录索引文件，默认使用该目录最新的索引快照")
+    encode_parser.add_argument("--verify", action="store_true", help="将加密后的文件与原文件哈希比较")
+
+    verify_parser = subparsers.add_parser(
+        "verify", parents=[common, selection, concurrency], help="校验目录中的文件是否与原文件一致"
+    )
+    verify_parser.add_argument("--index", help="目录索引文件，默认使用该目录最新的索引快照")
+
+    for name, description in (("premultiply", "直通透明转预乘透明"), ("straighten", "预乘透明转直通透明")):
+        image_parser = subparsers.add_parser(name, parents=[common], help=description)
+        image_parser.add_argument("paths", nargs="+", help="图像文件或包含图像文件的目录")
+        image_parser.add_argument("--output-dir", type=Path, help="输出目录，默认为当前目录下按转换类型命名的目录")
+        image_parser.add_argument("--workers", type=_positive_int, help="工作者数量，默认为CPU核心数")
+        image_parser.add_argument("--backend", choices=BACKENDS, default=BACKEND_AUTO, help="执行后端")
+        image_parser.add_argument("--memory-limit", type=_positive_int,
+                                  help="同时处理的图像估计内存之和的上限（MB），默认为可用物理内存的一半")
+        image_parser.add_argument("--strip-pixels", type=_positive_int,
+                                  help="分条处理时每条包含的像素数，默认约100万")
+
+    return parser
+
+
+_COMMANDS = {
+    "decrypt": _run_decrypt,
+    "encode": _run_encode,
+    "verify": _run_verify,
+    "premultiply": _run_images,
+    "straighten": _run_images,
+}
+
+
+def main(argv=None):
+    """
+    命令行入口
+
+    Args:
+        argv: 命令行参数，默认使用sys.argv
+
+    Returns:
+        int: 退出码
+    """
+    args = build_parser().parse_args(argv)
+    output = _Output(args.json)
+    try:
+        exit_code, stats = _COMMANDS[args.command](args, output)
+    except KeyboardInterrupt:
+        output.log("已中断\n")
+        exit_code, stats = EXIT_ERROR, None
+    except Exception as e:
+        output.log(f"错误: {str(e)}\n")
+        exit_code, stats = EXIT_ERROR, None
+    finally:
+        shutdown_executors(wait=False)
+    output.result(args.command, exit_code, stats)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,7 +19,9 @@ class ConfigManager:
             'decrypt_path': '',
             'encrypt_path': '',
             'cache_file': '',
-            'last_image_dir': ''
+            'last_image_dir': '',
+            'crypto_workers': 0,  # 加密/解密的工作者数量，0表示根据CPU核心数自动设置
+            'crypto_queue_depth': 0  # 同时提交的最大批次数，0表示根据工作者数量自动设置
         }
     
     @staticmethod
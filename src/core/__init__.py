@@ -1,10 +1,40 @@
 """
 核心功能包
+
+图像处理函数依赖PIL和numpy，在第一次访问时才导入image_processor模块，
+只使用加密/解密功能时不会加载这些依赖
 """
+import importlib
+
 from .crypto import decrypt, encode
-from .image_processor import premultiply_alpha, straight_alpha, batch_process_images
+from .executor import configure_executors, shutdown_executors
+from .file_filter import FileFilter
+from .index_cache import IndexCache
+from .probe import probe, load_probe_manifest
+from .verify import verify
+
+# 延迟导入的名称: 所在模块
+_LAZY_EXPORTS = {
+    'premultiply_alpha': '.image_processor',
+    'straight_alpha': '.image_processor',
+    'batch_process_images': '.image_processor',
+}
 
 __all__ = [
-    'decrypt', 'encode',
+    'decrypt', 'encode', 'probe', 'load_probe_manifest', 'verify',
+    'configure_executors', 'shutdown_executors', 'FileFilter', 'IndexCache',
     'premultiply_alpha', 'straight_alpha', 'batch_process_images'
-] 
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,19 +1,77 @@
 """
 加密解密核心功能模块
 """
+import errno
+import mmap
 import os
-import re
+import shutil
+import stat
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from binascii import hexlify, unhexlify
-import ujson
 from datetime import datetime
+from itertools import chain, islice
 
-# 创建线程池，优化线程数
-CPU_COUNT = os.cpu_count() or 4
-DECRYPT_EXECUTOR = ThreadPoolExecutor(max_workers=CPU_COUNT*2, thread_name_prefix="DecryptThread")
-ENCRYPT_EXECUTOR = ThreadPoolExecutor(max_workers=CPU_COUNT*2, thread_name_prefix="EncryptThread")
+from src.core.executor import (
+    AUTO_PROCESS_MIN_FILES, BACKEND_AUTO, BACKENDS, default_batch_size, executor_workers, iter_batch_results, open_executor, resolve_backend
+)
+from src.core.fingerprint import (
+    FingerprintIndex, STATUS_ADDED, STATUS_CHANGED, STATUS_UNCHANGED,
+    check_fingerprint, compute_fingerprint, compute_fingerprint_with_original
+)
+from src.core.index_cache import OFFSET_NOT_BUNDLE, OFFSET_UNKNOWN, IndexCache
+from src.core.index_store import CACHE_DIR, IndexStore
+from src.core.journal import InflightJournal, PrefixJournal, ProgressJournal
+from src.core.walker import mirror_tree, walk_files
+from src.utils.file_utils import atomic_output, link_file
+from src.utils.hash_utils import HASH_ALGORITHM, file_hash, new_hasher
+
+# 文件读写模式（解密与加密共用）
+# 所有模式都先写入同目录临时文件，fsync后原子替换原文件
+IO_MODE_MEMORY = "memory"  # 整个文件读入内存后切片
+IO_MODE_STREAM = "stream"  # 分块读取和写入，内存占用固定
+IO_MODE_MMAP = "mmap"      # 内存映射文件，从映射的memoryview切片直接写出
+IO_MODE_KERNEL = "kernel"  # 由内核复制数据，不经过用户态
+IO_MODES = (IO_MODE_MEMORY, IO_MODE_STREAM, IO_MODE_MMAP, IO_MODE_KERNEL)
+
+# 流式处理的块大小
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# 进度不足10%时也至少每隔这么多秒输出一次进度
+PROGRESS_LOG_INTERVAL = 2.0
+
+
+# UnityFS文件头签名: "UnityFS\0" 后接大端uint32格式版本号的高3个零字节
+UNITYFS_SIGNATURE = b"UnityFS\x00\x00\x00\x00"
+# 签名后一个字节(版本号低字节)的高4位必须为0
+UNITYFS_VERSION_MASK = 0xF0
+
+
+def scan_unityFS_signatures(file_data, max_hits=2, start=0):
+    """
+    在原始字节中扫描UnityFS签名
+    
+    直接在字节上搜索，不做hexlify，找到max_hits个签名后立即停止
+    
+    Args:
+        file_data: 文件二进制数据（bytes、bytearray或mmap）
+        max_hits: 最多返回的签名数量
+        start: 开始扫描的字节偏移
+        
+    Returns:
+        list: 签名所在的字节偏移列表
+    """
+    hits = []
+    sig_len = len(UNITYFS_SIGNATURE)
+    data_len = len(file_data)
+    pos = file_data.find(UNITYFS_SIGNATURE, start)
+    while pos != -1 and len(hits) < max_hits:
+        version_pos = pos + sig_len
+        if version_pos < data_len and not file_data[version_pos] & UNITYFS_VERSION_MASK:
+            hits.append(pos)
+            pos = file_data.find(UNITYFS_SIGNATURE, version_pos + 1)
+        else:
+            pos = file_data.find(UNITYFS_SIGNATURE, pos + 1)
+    return hits
 
 
 def find_next_unityFS_index(file_data: bytes):
@@ -24,161 +82,987 @@ def find_next_unityFS_index(file_data: bytes):
         file_data: 文件二进制数据
         
     Returns:
-        int: UnityFS索引位置，如果未找到则返回-1
+        int: 第一个UnityFS签名的字节偏移（文件中至少需要两个签名），如果未找到则返回-1
     """
-    openFileHex = hexlify(file_data)
-    unityFS_len = len(re.findall(b"556e6974794653000000000", openFileHex))
-    if unityFS_len < 2:
+    hits = scan_unityFS_signatures(file_data, max_hits=2)
+    if len(hits) < 2:
         return -1
-    else:
-        unityFS_index = openFileHex.find(b"556e6974794653000000000")
-        return unityFS_index
+    return hits[0]
+
+
+def find_unityFS_index_in_stream(f, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    分块读取文件流查找UnityFS索引位置，找到第二个签名后立即停止读取
+    
+    Args:
+        f: 以二进制模式打开的文件对象
+        chunk_size: 每次读取的字节数
+        
+    Returns:
+        int: 第一个UnityFS签名的字节偏移（文件中至少需要两个签名），如果未找到则返回-1
+    """
+    # 保留上一块末尾的字节，保证跨块的签名及其后的版本号字节能被完整匹配
+    overlap = len(UNITYFS_SIGNATURE)
+    hits = []
+    window = b""
+    window_offset = 0
+    while len(hits) < 2:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        tail = window[-overlap:]
+        window_offset += len(window) - len(tail)
+        window = tail + chunk
+        for pos in scan_unityFS_signatures(window, max_hits=2 - len(hits)):
+            hits.append(window_offset + pos)
+    if len(hits) < 2:
+        return -1
+    return hits[0]
+
+
+# copy_file_range/sendfile不支持当前文件系统或文件类型时返回的错误码
+_KERNEL_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def _read_at(fd, offset, size):
+    """按偏移读取，不支持os.pread的平台（Windows）使用lseek"""
+    if hasattr(os, "pread"):
+        return os.pread(fd, size, offset)
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def _kernel_copy(src_fd, dst_fd, offset, count):
+    """
+    将src_fd中从offset开始的count个字节追加写入dst_fd
+    
+    优先使用os.copy_file_range，其次os.sendfile，数据不经过用户态；
+    两者都不可用时（如Windows）回退为分块读写
+    
+    Args:
+        src_fd: 源文件描述符
+        dst_fd: 目标文件描述符
+        offset: 源文件起始偏移
+        count: 需要复制的字节数
+    
+    Raises:
+        IOError: 源文件在复制完成前结束，复制的字节数少于count
+    """
+    copied = 0
+    kernel_funcs = []
+    if hasattr(os, "copy_file_range"):
+        kernel_funcs.append(_copy_file_range)
+    if hasattr(os, "sendfile"):
+        kernel_funcs.append(_sendfile)
+    
+    # 某些文件系统上内核复制不报错而是返回0，此时换用下一种方式，由分块读写确认源文件是否已经结束
+    for kernel_func in kernel_funcs:
+        try:
+            while copied < count:
+                n = kernel_func(src_fd, dst_fd, offset + copied, count - copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError as e:
+            if e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                raise
+        if copied == count:
+            return
+    
+    while copied < count:
+        block = _read_at(src_fd, offset + copied, min(STREAM_CHUNK_SIZE, count - copied))
+        if not block:
+            break
+        os.write(dst_fd, block)
+        copied += len(block)
+    
+    # 源文件被截断等原因导致提前结束时不能用不完整的临时文件替换原文件
+    if copied != count:
+        raise IOError(f"复制了 {copied} 字节，应为 {count} 字节")
+
+
+def _record_prefix(journal, file_path: Path, prefix):
+    """改写文件前将要去除的前缀记入日志，运行在写入快照前被中断时可以找回"""
+    if journal is not None:
+        journal.record_prefix(file_path, prefix)
+
+
+class _PayloadHashes:
+    """边写出边计算解密后内容和原文件（前缀+解密后内容）的快速哈希，不需要再读取一遍文件"""
+    
+    def __init__(self, prefix):
+        self.payload = new_hasher()
+        self.original = new_hasher()
+        self.original.update(prefix)
+    
+    def update(self, data):
+        self.payload.update(data)
+        self.original.update(data)
+    
+    def hexdigests(self):
+        return self.payload.hexdigest(), self.original.hexdigest()
+
+
+def _strip_prefix_memory(file_path: Path, find_offset, journal=None, target_path=None, with_hashes=False):
+    """整个文件读入内存，查找前缀长度后写出剩余部分"""
+    with open(file_path, "rb") as f:
+        file_data = f.read()
+    
+    offset = find_offset(file_data)
+    hashes = _PayloadHashes(file_data[:max(offset, 0)]) if with_hashes else None
+    if hashes is not None:
+        # 文件已在内存中，不是UnityFS文件时也直接计算哈希
+        hashes.update(memoryview(file_data)[max(offset, 0):])
+    digests = hashes.hexdigests() if hashes is not None else None
+    if offset == -1:
+        return None, digests
+    if offset > 0:
+        _record_prefix(journal, target_path or file_path, file_data[:offset])
+        with atomic_output(target_path or file_path, journal, file_path) as out:
+            out.write(memoryview(file_data)[offset:])
+    return file_data[:offset], digests
+
+
+def _strip_prefix_mmap(file_path: Path, find_offset, journal=None, target_path=None, with_hashes=False):
+    """在内存映射上查找前缀长度，从映射的memoryview切片写出剩余部分，不在堆上复制文件内容"""
+    # 空文件无法映射
+    if os.path.getsize(file_path) == 0:
+        return _strip_prefix_memory(file_path, find_offset, journal, target_path, with_hashes)
+    
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        offset = find_offset(mm)
+        prefix = mm[:offset] if offset != -1 else None
+    if offset <= 0:
+        return prefix, None
+    hashes = _PayloadHashes(prefix) if with_hashes else None
+    _record_prefix(journal, target_path or file_path, prefix)
+    # 替换前必须关闭原文件的映射和句柄（Windows无法替换已打开的文件）
+    with atomic_output(target_path or file_path, journal, file_path) as out:
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm)[offset:] as payload:
+                out.write(payload)
+                if hashes is not None:
+                    hashes.update(payload)
+    return prefix, hashes.hexdigests() if hashes is not None else None
+
+
+def _strip_prefix_stream(file_path: Path, find_offset, journal=None, target_path=None, with_hashes=False):
+    """分块读取查找前缀长度，再分块写出剩余部分，每个文件的内存占用不超过块大小"""
+    with open(file_path, "rb") as f:
+        offset = find_offset(f)
+        if offset == -1:
+            return None, None
+        f.seek(0)
+        prefix = f.read(offset)
+    if offset == 0:
+        return prefix, None
+    hashes = _PayloadHashes(prefix) if with_hashes else None
+    _record_prefix(journal, target_path or file_path, prefix)
+    with atomic_output(target_path or file_path, journal, file_path) as out:
+        with open(file_path, "rb") as f:
+            f.seek(offset)
+            for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+                out.write(chunk)
+                if hashes is not None:
+                    hashes.update(chunk)
+    return prefix, hashes.hexdigests() if hashes is not None else None
+
+
+def _strip_prefix_kernel(file_path: Path, find_offset, journal=None, target_path=None, with_hashes=False):
+    """分块读取查找前缀长度，再由内核将剩余部分复制到临时文件，数据不经过用户态，无法同时计算哈希"""
+    with open(file_path, "rb") as f:
+        offset = find_offset(f)
+        if offset == -1:
+            return None, None
+        f.seek(0)
+        prefix = f.read(offset)
+    if offset > 0:
+        _record_prefix(journal, target_path or file_path, prefix)
+        with atomic_output(target_path or file_path, journal, file_path) as out:
+            with open(file_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                _kernel_copy(f.fileno(), out.fileno(), offset, max(size - offset, 0))
+    return prefix, None
+
+
+# 各读写模式的去除前缀函数，返回(去除的前缀, 哈希)，未找到前缀位置时前缀为None；
+# with_hashes为True时尽量在写出的同时计算(解密后内容的哈希, 原文件的哈希)，无法顺便计算时哈希为None。
+# 设置了target_path时写入target_path，原文件保持不变，没有前缀的文件不写入
+
+_STRIP_FUNCTIONS = {
+    IO_MODE_MEMORY: _strip_prefix_memory,
+    IO_MODE_STREAM: _strip_prefix_stream,
+    IO_MODE_MMAP: _strip_prefix_mmap,
+    IO_MODE_KERNEL: _strip_prefix_kernel,
+}
+
+# 以文件对象而不是字节缓冲区查找前缀长度的模式
+_STREAM_IO_MODES = (IO_MODE_STREAM, IO_MODE_KERNEL)
+
+
+def _write_buffers(fd, buffers):
+    """
+    将多个缓冲区写入文件描述符，支持os.writev的平台上合并为一次系统调用，不拼接缓冲区
+    
+    Args:
+        fd: 文件描述符
+        buffers: 缓冲区列表
+    """
+    views = [memoryview(buffer).cast("B") for buffer in buffers if len(buffer)]
+    if not hasattr(os, "writev"):
+        for view in views:
+            while len(view):
+                view = view[os.write(fd, view):]
+        return
+    while views:
+        written = os.writev(fd, views)
+        # 部分写入时跳过已写入的部分继续写
+        while views and written >= len(views[0]):
+            written -= len(views[0])
+            views.pop(0)
+        if views and written:
+            views[0] = views[0][written:]
+
+
+def _restore_prefix_memory(file_path: Path, prefix, out):
+    """整个文件读入内存，与前缀一次写出"""
+    with open(file_path, "rb") as f:
+        file_data = f.read()
+    _write_buffers(out.fileno(), (prefix, file_data))
+
+
+def _restore_prefix_mmap(file_path: Path, prefix, out):
+    """从内存映射的memoryview与前缀一次写出，不在堆上复制文件内容"""
+    if os.path.getsize(file_path) == 0:
+        return _restore_prefix_memory(file_path, prefix, out)
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as payload:
+            _write_buffers(out.fileno(), (prefix, payload))
 
 
-def decrypt_file(file_path: Path, log_callback):
+def _restore_prefix_stream(file_path: Path, prefix, out):
+    """写出前缀后分块复制文件内容"""
+    out.write(prefix)
+    with open(file_path, "rb") as f:
+        shutil.copyfileobj(f, out, STREAM_CHUNK_SIZE)
+    out.flush()
+
+
+def _restore_prefix_kernel(file_path: Path, prefix, out):
+    """写出前缀后由内核复制文件内容"""
+    _write_buffers(out.fileno(), (prefix,))
+    with open(file_path, "rb") as f:
+        _kernel_copy(f.fileno(), out.fileno(), 0, os.fstat(f.fileno()).st_size)
+
+
+# 各读写模式的恢复前缀函数，将前缀和文件内容写入临时文件out
+_RESTORE_FUNCTIONS = {
+    IO_MODE_MEMORY: _restore_prefix_memory,
+    IO_MODE_STREAM: _restore_prefix_stream,
+    IO_MODE_MMAP: _restore_prefix_mmap,
+    IO_MODE_KERNEL: _restore_prefix_kernel,
+}
+
+
+def decrypt_file(file_path: Path, log_callback, mode=IO_MODE_MEMORY, journal=None, target_path=None):
     """
     解密单个文件
     
     Args:
         file_path: 文件路径
         log_callback: 日志回调函数
+        mode: 读写模式，IO_MODES之一
+        journal: 可选的进行中文件日志
+        target_path: 输出文件路径，默认覆盖原文件
     
     Returns:
         bool: 解密是否成功
     """
     try:
-        # 读取文件
-        with open(file_path, "rb") as f:
-            file_data = f.read()
-        
-        # 查找索引
-        unityFS_index = find_next_unityFS_index(file_data)
-        if unityFS_index == -1:
-            return False
-        
-        # 保存解密后的文件
-        with open(file_path, "wb") as f:
-            f.write(file_data[unityFS_index//2:])
-        
-        return True
+        return _decrypt_file_prefix(file_path, mode, journal, target_path)[0] is not None
     except Exception as e:
         log_callback(f"解密文件 {file_path.name} 时出错: {str(e)}")
         return False
 
 
-def decrypt(game_bundles_path: Path, log_callback=None):
+def _decrypt_file_prefix(file_path: Path, mode, journal, target_path=None, with_hashes=False):
+    """
+    解密单个文件并返回去除的前缀
+    
+    输出到其他目录时，不需要修改的文件（没有前缀或不是UnityFS文件）以链接的方式放到输出目录
+    
+    Returns:
+        tuple: (去除的前缀（文件本来就没有前缀时为空，未找到UnityFS签名时为None）,
+                with_hashes为True且写出时顺便计算了哈希时为(解密后内容的哈希, 原文件的哈希)，否则为None)
+    
+    Raises:
+        Exception: 读写文件出错，原文件保持不变
+    """
+    find_offset = find_unityFS_index_in_stream if mode in _STREAM_IO_MODES else find_next_unityFS_index
+    if target_path is not None:
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+    prefix, digests = _STRIP_FUNCTIONS[mode](file_path, find_offset, journal, target_path, with_hashes)
+    if target_path is not None and not prefix:
+        link_file(file_path, target_path)
+    return prefix, digests
+
+
+def _decrypt_file_incremental(file_path: Path, previous, mode, journal, target_path=None):
+    """
+    根据文件指纹判断文件是否需要解密，只解密新增或变化的文件
+    
+    原地解密时指纹记录解密后的文件；输出到其他目录时原文件不变，指纹记录原文件，
+    输出文件不存在时即使原文件没有变化也重新解密。
+    memory/stream/mmap模式在写出的同时计算指纹和原文件哈希；kernel模式的数据不经过用户态，
+    本来就没有前缀的文件也不需要写出，这些文件需要再读取一遍计算指纹
+    
+    Args:
+        file_path: 文件路径
+        previous: 上次记录的文件指纹，没有记录时为None
+        mode: 读写模式
+        journal: 进行中文件日志
+        target_path: 输出文件路径，默认覆盖原文件
+    
+    Returns:
+        tuple: (文件状态, 去除的前缀（未解密时为None）, 处理后的文件指纹, 原文件哈希（没有去除前缀时为None）)
+    
+    Raises:
+        Exception: 解密文件出错，调用方应记为失败且不更新指纹，下次运行时重试
+    """
+    status, fingerprint = check_fingerprint(file_path, previous)
+    if status == STATUS_UNCHANGED and (target_path is None or target_path.exists()):
+        return status, None, fingerprint, None
+    
+    prefix, digests = _decrypt_file_prefix(file_path, mode, journal, target_path, with_hashes=True)
+    original_hash = None
+    try:
+        if digests is not None:
+            # 写出时已经计算了哈希；输出到其他目录时指纹记录原文件
+            payload_hash, full_hash = digests
+            st = os.stat(file_path)
+            fingerprint = [st.st_size, st.st_mtime_ns, full_hash if target_path is not None else payload_hash]
+            if prefix:
+                original_hash = full_hash
+        elif target_path is not None:
+            fingerprint = compute_fingerprint(file_path)
+            # 原文件没有被修改，去除了前缀时其哈希就是原文件哈希；
+            # 本来就没有前缀的文件无法得知原文件，哈希与解密后的文件相同，不能用于校验
+            if prefix:
+                original_hash = fingerprint[2]
+        elif prefix:
+            # 计算指纹时顺便得到原文件的哈希，不需要再读取一遍
+            fingerprint, original_hash = compute_fingerprint_with_original(file_path, prefix)
+        else:
+            fingerprint = compute_fingerprint(file_path)
+    except OSError:
+        fingerprint = None
+    return status, prefix, fingerprint, original_hash
+
+
+def _decrypt_batch(batch, mode, journal):
+    """
+    解密一批文件，供线程池或进程池执行
+    
+    Args:
+        batch: [(文件路径, 上次记录的文件指纹, 输出文件路径), ...]，原地解密时输出文件路径为None
+        mode: 读写模式
+        journal: 进行中文件日志
+    
+    Returns:
+        tuple: (每个文件的_decrypt_file_incremental结果或异常对象的列表, 日志消息列表)
+    """
+    results = []
+    for file_path, previous, target_path in batch:
+        try:
+            results.append(_decrypt_file_incremental(file_path, previous, mode, journal, target_path))
+        except Exception as e:
+            results.append(e)
+    return results, []
+
+
+def _encode_batch(batch, mode, journal):
+    """
+    加密一批文件，供线程池或进程池执行
+    
+    Args:
+        batch: [(文件路径, 文件头, 原文件哈希, 输出文件路径), ...]，不需要校验时原文件哈希为None，
+               原地加密时输出文件路径为None
+        mode: 读写模式
+        journal: 进行中文件日志
+    
+    Returns:
+        tuple: ([(是否加密成功, 加密后的文件与原文件是否一致（未校验时为None）)或异常对象, ...], 日志消息列表)
+    """
+    messages = []
+    results = []
+    for file_path, header, original_hash, target_path in batch:
+        try:
+            result = _encode_file_header(file_path, header, mode, journal, target_path)
+        except Exception as e:
+            # 出错的文件由调用方记为失败，不写入进度日志，下次运行时重试
+            results.append(e)
+            continue
+        if not result:
+            messages.append(f"文件 {file_path.name} 不是解密后的UnityFS文件，跳过")
+        matched = None
+        if result and original_hash is not None:
+            # 在工作者中分块计算哈希，与其他文件的加密并行进行
+            try:
+                matched = file_hash(target_path or file_path) == original_hash
+            except OSError as e:
+                messages.append(f"校验文件 {file_path.name} 时出错: {str(e)}")
+                matched = False
+        results.append((result, matched))
+    return results, messages
+
+
+def _check_backend(backend, log_callback):
+    """检查执行后端参数是否有效"""
+    if backend not in BACKENDS:
+        log_callback(f"错误: 不支持的执行后端 {backend}\n")
+        return False
+    return True
+
+
+# 改写文件的操作，每种操作使用各自的进行中文件日志和运行进度日志
+_OPERATIONS = ("decrypt", "encode")
+
+
+def _open_inflight_journal(game_bundles_path: Path, operation, log_callback, run_journal=None):
+    """
+    打开目标目录的进行中文件日志，并恢复上次中断时留下的文件
+    
+    解密和加密各自使用一个日志，所有操作留下的文件都会回滚或确认完成，
+    但只有本次操作上次替换完成的文件才记入运行进度日志，其他操作替换的文件仍需本次处理
+    
+    Args:
+        game_bundles_path: 目标目录
+        operation: 本次运行的操作，_OPERATIONS之一
+        log_callback: 日志回调函数
+        run_journal: 可选的运行进度日志，本次操作上次替换已完成的文件会记入其中
+    
+    Returns:
+        InflightJournal: 本次运行使用的日志
+    """
+    for name in _OPERATIONS:
+        recovered = InflightJournal.for_directory(game_bundles_path, name).recover()
+        if recovered["rolled_back"] or recovered["completed"]:
+            log_callback(
+                f"检测到上次运行被中断: {len(recovered['rolled_back'])} 个文件已回滚为原文件, "
+                f"{len(recovered['completed'])} 个文件已处理完成\n"
+            )
+        if recovered["prefixes"]:
+            # 上次解密去除的前缀还没有写入快照，转存到前缀日志，直到下次解密写入快照
+            prefix_journal = PrefixJournal.for_directory(game_bundles_path)
+            for file_path, prefix in recovered["prefixes"].items():
+                prefix_journal.record(file_path, prefix)
+            prefix_journal.close()
+        if run_journal is None or name != operation:
+            continue
+        for file_path in recovered["completed"]:
+            try:
+                run_journal.mark_finished(str(file_path.relative_to(game_bundles_path)), file_path)
+            except (ValueError, OSError):
+                continue
+    return InflightJournal.for_directory(game_bundles_path, operation)
+
+
+def _prepare_run_journal(run_journal, resume, log_callback):
+    """
+    读取运行进度日志
+    
+    Args:
+        run_journal: 运行进度日志
+        resume: 是否续跑上次中断的运行；为False时丢弃已有的进度
+        log_callback: 日志回调函数
+    
+    Returns:
+        bool: 是否存在可以续跑的进度
+    """
+    if not resume:
+        run_journal.clear()
+        return False
+    
+    finished = run_journal.load()
+    if finished:
+        log_callback(f"续跑上次中断的运行，上次已完成 {finished} 个文件\n")
+    return finished > 0
+
+
+def _filter_finished_files(game_bundles_path: Path, bundle_files, run_journal, resume, log_callback):
+    """
+    根据运行进度日志过滤掉上次运行中已完成的文件
+    
+    Args:
+        game_bundles_path: 目标目录
+        bundle_files: 本次需要处理的文件列表
+        run_journal: 运行进度日志
+        resume: 是否续跑上次中断的运行；为False时丢弃已有的进度
+        log_callback: 日志回调函数
+    
+    Returns:
+        list: 仍需处理的文件列表
+    """
+    if not _prepare_run_journal(run_journal, resume, log_callback):
+        return bundle_files
+    
+    pending_files = [
+        f for f in bundle_files
+        if not run_journal.is_finished(str(f.relative_to(game_bundles_path)), f)
+    ]
+    log_callback(f"续跑上次中断的运行，跳过 {len(bundle_files) - len(pending_files)} 个已完成的文件\n")
+    return pending_files
+
+
+def _close_run_journal(run_journal, failed):
+    """运行结束后关闭进度日志，全部成功时删除日志，否则保留以便下次续跑"""
+    if failed == 0:
+        run_journal.clear()
+    else:
+        run_journal.close()
+
+
+def _load_pending_prefixes(prefix_journal, work_dir: Path):
+    """
+    读取前缀日志中尚未写入快照的前缀
+    
+    Returns:
+        dict: {以"/"分隔的相对路径: 去除的前缀}
+    """
+    prefixes = {}
+    for file_path, prefix in prefix_journal.load().items():
+        try:
+            prefixes[file_path.relative_to(work_dir).as_posix()] = prefix
+        except ValueError:
+            continue
+    return prefixes
+
+
+def _carried_prefix(key, previous_entries, pending_prefixes):
+    """
+    获取本次没有去除前缀的文件沿用的前缀和原文件哈希，被中断的运行中去除的前缀优先于快照中的记录
+    
+    Returns:
+        tuple: (前缀, 原文件哈希)，都没有记录时均为None
+    """
+    previous = previous_entries.get(key)
+    if key in pending_prefixes:
+        prefix = pending_prefixes[key]
+        # 快照中的原文件哈希只在前缀相同时仍然有效
+        same_prefix = previous is not None and previous.prefix == prefix
+        return prefix, previous.original_hash if same_prefix else None
+    if previous is not None and previous.prefix is not None:
+        return previous.prefix, previous.original_hash
+    return None, None
+
+
+def _load_previous_entries(store, game_bundles_path: Path):
+    """
+    读取目录最新快照中的文件记录
+    
+    Returns:
+        dict: {以"/"分隔的相对路径: IndexEntry}；没有快照或快照无法读取时为空，
+              哈希算法不同时原文件哈希为None
+    """
+    snapshot = store.latest(game_bundles_path)
+    if snapshot is None:
+        return {}
+    try:
+        index = IndexCache.load(snapshot)
+    except (OSError, ValueError):
+        return {}
+    if index.hash_algorithm == HASH_ALGORITHM:
+        return {entry.path: entry for entry in index.entries()}
+    return {entry.path: entry._replace(original_hash=None) for entry in index.entries()}
+
+
+def _check_output_dir(game_bundles_path: Path, output_dir, log_callback):
+    """
+    检查输出目录参数
+    
+    Returns:
+        输出目录的Path；未设置或与原目录相同时为None；输出目录与原目录互相包含时返回False
+    """
+    if output_dir is None:
+        return None
+    output_dir = Path(output_dir)
+    source = game_bundles_path.resolve()
+    output = output_dir.resolve()
+    if output == source:
+        return None
+    if source in output.parents or output in source.parents:
+        log_callback(f"错误: 输出目录 {output_dir} 不能与原目录 {game_bundles_path} 互相包含\n")
+        return False
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir
+
+
+def _mirror_unprocessed(game_bundles_path: Path, output_dir: Path, processed, log_callback):
+    """将原目录中本次没有处理的文件链接到输出目录，使输出目录与原目录结构一致"""
+    try:
+        counts = mirror_tree(game_bundles_path, output_dir, set(processed))
+    except OSError as e:
+        log_callback(f"\n链接其他文件到输出目录时出错: {str(e)}\n")
+        return
+    if counts:
+        summary = ", ".join(f"{method}: {count}" for method, count in counts.items())
+        log_callback(f"\n其他文件已链接到输出目录 {output_dir} ({summary})")
+
+
+class _BundleScan:
+    """
+    边遍历目录边生成解密任务
+    
+    遍历在调用方线程中按需进行，遍历到的文件立即交给执行器，扫描和解密同时进行
+    """
+    
+    def __init__(self, game_bundles_path: Path, run_journal, resuming, fingerprints, file_filter=None,
+                 output_dir=None):
+        """
+        初始化扫描
+        
+        Args:
+            game_bundles_path: 游戏资源目录
+            run_journal: 运行进度日志
+            resuming: 是否需要跳过上次中断的运行中已完成的文件
+            fingerprints: 文件指纹索引
+            file_filter: 文件筛选规则
+            output_dir: 输出目录，None表示原地解密
+        """
+        self.game_bundles_path = game_bundles_path
+        self.file_filter = file_filter
+        self.output_dir = output_dir
+        self.run_journal = run_journal
+        self.resuming = resuming
+        self.fingerprints = fingerprints
+        self.rel_paths = []  # 遍历到的所有文件，用于生成index_cache
+        self.resumed = 0
+        self.finished = False
+    
+    @property
+    def pending_total(self):
+        """需要处理的文件总数，遍历尚未结束时为None"""
+        if not self.finished:
+            return None
+        return len(self.rel_paths) - self.resumed
+    
+    def __iter__(self):
+        for file, rel_path in walk_files(self.game_bundles_path, self.file_filter):
+            self.rel_paths.append(rel_path)
+            if self.resuming and self.run_journal.is_finished(rel_path, file):
+                # 上次中断的运行中已完成的文件只记录大小和修改时间
+                self.fingerprints.update_from_stat(rel_path, file)
+                self.resumed += 1
+                continue
+            target = self.output_dir / rel_path if self.output_dir is not None else None
+            yield file, self.fingerprints.get(rel_path), target
+        self.finished = True
+
+
+def decrypt(game_bundles_path: Path, log_callback=None, mode=IO_MODE_MEMORY, resume=True, incremental=True,
+            backend=BACKEND_AUTO, batch_size=None, max_workers=None, queue_depth=None, file_filter=None,
+            export_json=False, output_dir=None):
     """
     解密目录下的所有资源文件
     
     Args:
         game_bundles_path: 游戏资源目录
         log_callback: 日志回调函数
+        mode: 读写模式，IO_MODE_STREAM/IO_MODE_MMAP/IO_MODE_KERNEL可避免将整个文件读入内存
+        resume: 是否跳过上次中断的运行中已完成的文件
+        incremental: 是否根据上次运行保存的文件指纹跳过未变化的文件
+        backend: 执行后端，BACKENDS之一
+        batch_size: 每批提交的文件数量，默认根据文件数量和工作者数量计算
+        max_workers: 工作者数量，默认使用configure_executors设置的值
+        queue_depth: 同时提交的最大批次数，默认使用configure_executors设置的值
+        file_filter: 文件筛选规则（FileFilter），默认处理所有文件
+        export_json: 是否同时将目录索引导出为便于阅读的JSON文件
+        output_dir: 输出目录，设置时原目录保持不变，解密后的文件写入输出目录的相同相对位置，
+                    其他文件以reflink/硬链接的方式放到输出目录
+    
+    Returns:
+        dict: 统计信息{"successful", "skipped", "failed", "resumed", "added", "changed", "unchanged",
+              "index": 目录索引快照路径}，参数错误或目录不存在时返回None
     """
     if log_callback is None:
         log_callback = print
     
+    if mode not in IO_MODES:
+        log_callback(f"错误: 不支持的读写模式 {mode}\n")
+        return None
+    
+    if not _check_backend(backend, log_callback):
+        return None
+    
     # 确保路径存在
     if not game_bundles_path.exists():
         log_callback(f"错误: 路径 {game_bundles_path} 不存在\n")
-        return
+        return None
+    
+    output_dir = _check_output_dir(game_bundles_path, output_dir, log_callback)
+    if output_dir is False:
+        return None
+    # 输出到其他目录时，日志和指纹按输出目录记录，与原地解密互不影响
+    work_dir = output_dir or game_bundles_path
+    
+    run_journal = ProgressJournal.for_directory(work_dir, "decrypt")
+    journal = _open_inflight_journal(work_dir, "decrypt", log_callback, run_journal)
+    prefix_journal = PrefixJournal.for_directory(work_dir)
+    pending_prefixes = _load_pending_prefixes(prefix_journal, work_dir)
+    if pending_prefixes:
+        log_callback(f"找回上次运行中 {len(pending_prefixes)} 个文件去除的前缀\n")
     
     log_callback(f"正在扫描目录: {game_bundles_path}\n")
     start_time = time.time()
     
-    # 收集所有文件
-    all_files = list(game_bundles_path.glob("**/*"))
-    bundle_files = [f for f in all_files if f.is_file() and not f.name.endswith((".meta", ".manifest", ".json"))]
-    
-    if not bundle_files:
-        log_callback("未找到需要解密的文件\n")
-        return
+    # 读取上次运行保存的文件指纹
+    fingerprints = FingerprintIndex.for_directory(work_dir)
+    if incremental:
+        fingerprints.load()
+    resuming = _prepare_run_journal(run_journal, resume, log_callback)
     
-    log_callback(f"找到 {len(bundle_files)} 个可能需要解密的文件\n")
+    # 边遍历边解密，先取出一部分文件用于选择执行后端
+    scan = _BundleScan(game_bundles_path, run_journal, resuming, fingerprints, file_filter, output_dir)
+    items = iter(scan)
+    head = list(islice(items, AUTO_PROCESS_MIN_FILES))
+    backend = resolve_backend(backend, scan.pending_total if scan.finished else AUTO_PROCESS_MIN_FILES)
+    items = chain(head, items)
     log_callback("开始解密资源文件...\n")
     
     # 计数器
     successful = 0
     failed = 0
     skipped = 0
-    total = len(bundle_files)
     last_progress = 0
+    last_progress_time = time.time()
+    change_counts = {STATUS_ADDED: 0, STATUS_CHANGED: 0, STATUS_UNCHANGED: 0}
+    prefixes = {}  # 本次解密的文件去除的前缀
+    not_bundles = set()  # 本次处理的文件中不是UnityFS文件的文件
+    unchanged = set()  # 根据指纹跳过的文件
+    original_hashes = {}  # 本次解密的文件解密前的哈希
     
-    # 提交所有任务
-    futures = {DECRYPT_EXECUTOR.submit(decrypt_file, file, log_callback): file for file in bundle_files}
-    
-    # 处理结果
-    for i, future in enumerate(as_completed(futures), 1):
-        file = futures[future]
-        try:
-            result = future.result()
-            if result:
-                successful += 1
-                # 仅在完成重要进度时输出日志，减少日志刷屏
-                progress = int(i / total * 100)
-                if progress >= last_progress + 10 or i == total:
-                    log_callback(f"进度: {progress}% ({i}/{total})")
-                    last_progress = progress
+    # 按滑动窗口分批提交任务，任务在需要时才生成
+    with open_executor(backend, "Decrypt", max_workers) as executor:
+        batch_size = batch_size or default_batch_size(scan.pending_total, executor_workers(executor))
+        batch_results = iter_batch_results(
+            executor, _decrypt_batch, items, batch_size, (mode, journal), log_callback, queue_depth
+        )
+        
+        # 处理结果
+        for i, (file, outcome) in enumerate(batch_results, 1):
+            rel_path = str(file.relative_to(game_bundles_path))
+            if isinstance(outcome, Exception):
+                failed += 1
+                log_callback(f"处理 {file.name} 时出错: {str(outcome)}")
             else:
-                skipped += 1
-        except Exception as e:
-            failed += 1
-            log_callback(f"处理 {file.name} 时出错: {str(e)}")
+                status, prefix, fingerprint, original_hash = outcome
+                change_counts[status] += 1
+                if fingerprint is not None:
+                    fingerprints.update(rel_path, fingerprint)
+                if status == STATUS_UNCHANGED:
+                    unchanged.add(rel_path)
+                elif prefix is not None:
+                    successful += 1
+                    # 本来就没有前缀的文件不记录空前缀和哈希，沿用之前的记录
+                    if prefix:
+                        prefixes[rel_path] = prefix
+                        original_hashes[rel_path] = original_hash
+                    run_journal.mark_finished(rel_path, file)
+                else:
+                    skipped += 1
+                    not_bundles.add(rel_path)
+            
+            # 仅在完成重要进度时输出日志，减少日志刷屏；遍历结束前总数未知，只定时输出已处理数量
+            total = scan.pending_total
+            now = time.time()
+            if total is None:
+                if now - last_progress_time >= PROGRESS_LOG_INTERVAL:
+                    log_callback(f"进度: 已处理 {i} 个文件，已扫描 {len(scan.rel_paths)} 个文件")
+                    last_progress_time = now
+                continue
+            progress = int(i / total * 100)
+            if progress >= last_progress + 10 or i == total or now - last_progress_time >= PROGRESS_LOG_INTERVAL:
+                log_callback(f"进度: {progress}% ({i}/{total})")
+                last_progress = progress
+                last_progress_time = now
+    
+    # 所有文件都已替换或回滚，日志中只剩下去除的前缀，写入快照后再删除
+    journal.close()
+    _close_run_journal(run_journal, failed)
+    
+    if output_dir is not None:
+        _mirror_unprocessed(game_bundles_path, output_dir, scan.rel_paths, log_callback)
+    
+    stats = {
+        "successful": successful,
+        "skipped": skipped,
+        "failed": failed,
+        "resumed": scan.resumed,
+        "added": change_counts[STATUS_ADDED],
+        "changed": change_counts[STATUS_CHANGED],
+        "unchanged": change_counts[STATUS_UNCHANGED],
+        "index": None,
+    }
+    if not scan.rel_paths:
+        journal.clear()
+        log_callback("未找到需要解密的文件\n")
+        return stats
+    log_callback(f"\n共扫描到 {len(scan.rel_paths)} 个可能需要解密的文件")
     
-    # 生成index_cache文件（存储目录信息）
+    # 保存文件指纹供下次增量解密使用
     try:
-        # 提取目录结构
-        directory_structure = {}
-        for file in bundle_files:
-            rel_path = str(file.relative_to(game_bundles_path))
-            directory_structure[rel_path] = str(rel_path)
-        
-        # 保存为JSON文件
-        cache_dir = Path("cache")
-        cache_dir.mkdir(exist_ok=True)
+        fingerprints.save(prune=file_filter is None)
+    except Exception as e:
+        log_callback(f"\n保存文件指纹时出错: {str(e)}\n")
+    
+    # 生成目录索引
+    try:
+        # 本次没有去除前缀的文件（未变化、续跑跳过或已经解密过）沿用被中断的运行或上次快照记录的前缀；
+        # 索引描述解密后的目录，输出到其他目录时快照按输出目录保存，加密和校验时使用输出目录即可找到
+        store = IndexStore()
+        previous_entries = _load_previous_entries(store, work_dir)
+        index = IndexCache()
+        index.hash_algorithm = HASH_ALGORITHM
+        visited = set()
+        for rel_path in scan.rel_paths:
+            key = rel_path.replace(os.sep, "/")
+            visited.add(key)
+            # 输出到其他目录时指纹记录的是原文件，大小取输出文件的大小
+            fingerprint = fingerprints.current(rel_path) if output_dir is None else None
+            if fingerprint is not None:
+                size = fingerprint[0]
+            else:
+                try:
+                    size = os.path.getsize(work_dir / rel_path)
+                except OSError:
+                    size = 0
+            if rel_path in not_bundles:
+                index.add(rel_path, size, OFFSET_NOT_BUNDLE)
+                continue
+            prefix = prefixes.get(rel_path)
+            original_hash = original_hashes.get(rel_path)
+            offset = OFFSET_UNKNOWN
+            if prefix is None:
+                prefix, original_hash = _carried_prefix(key, previous_entries, pending_prefixes)
+                previous = previous_entries.get(key)
+                if prefix is None and rel_path in unchanged and previous is not None:
+                    offset = previous.offset
+            index.add(rel_path, size, offset, prefix, original_hash)
+        if file_filter is not None:
+            # 筛选后只遍历了部分文件，其余文件沿用上次快照中的记录，否则新快照会丢失它们的前缀
+            for key in sorted((previous_entries.keys() | pending_prefixes.keys()) - visited):
+                previous = previous_entries.get(key)
+                if previous is not None:
+                    size, offset = previous.size, previous.offset
+                else:
+                    try:
+                        size, offset = os.path.getsize(work_dir / key), OFFSET_UNKNOWN
+                    except OSError:
+                        continue
+                prefix, original_hash = _carried_prefix(key, previous_entries, pending_prefixes)
+                index.add(key, size, offset, prefix, original_hash)
         
-        cache_file = cache_dir / f"index_cache_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(cache_file, "w", encoding="utf-8") as f:
-            ujson.dump(directory_structure, f, ensure_ascii=False, indent=2)
+        # 按内容哈希保存快照，目录没有变化时复用已有快照
+        cache_file, reused = store.put(index, work_dir)
+        stats["index"] = str(cache_file)
+        # 前缀都已写入快照
+        journal.clear()
+        prefix_journal.clear()
+        if reused:
+            log_callback(f"\n目录索引没有变化，复用已有快照: {cache_file}\n")
+        else:
+            log_callback(f"\n目录索引已保存至: {cache_file}\n")
         
-        log_callback(f"\n目录索引已保存至: {cache_file}\n")
+        if export_json:
+            json_file = CACHE_DIR / f"index_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            index.export_json(json_file)
+            log_callback(f"目录索引已导出为JSON: {json_file}\n")
     except Exception as e:
         log_callback(f"\n保存目录索引时出错: {str(e)}\n")
     
     # 打印统计信息
     elapsed = time.time() - start_time
     log_callback(f"\n解密完成! 耗时: {elapsed:.2f}秒")
-    log_callback(f"成功: {successful}, 跳过: {skipped}, 失败: {failed}\n")
+    log_callback(f"成功: {successful}, 跳过: {skipped}, 失败: {failed}, 续跑跳过: {scan.resumed}")
+    log_callback(
+        f"新增: {change_counts[STATUS_ADDED]}, 变更: {change_counts[STATUS_CHANGED]}, "
+        f"未变化: {change_counts[STATUS_UNCHANGED]}\n"
+    )
+    return stats
 
 
-def encode_file(file_path: Path, header_len, log_callback):
+def encode_file(file_path: Path, header, log_callback, mode=IO_MODE_MEMORY, journal=None, target_path=None):
     """
-    加密单个文件
+    加密单个文件，在文件开头恢复解密时去除的文件头
     
     Args:
         file_path: 文件路径
-        header_len: 文件头长度
+        header: 解密时去除的文件头
         log_callback: 日志回调函数
+        mode: 读写模式，IO_MODES之一
+        journal: 可选的进行中文件日志
+        target_path: 输出文件路径，默认覆盖原文件
     
     Returns:
         bool: 加密是否成功
     """
     try:
-        file_content = b""
-        with open(file_path, "rb") as f:
-            file_content = f.read()
-        
-        encoded = file_content[header_len:]
-        
-        with open(file_path, "wb") as f:
-            f.write(encoded)
-        
-        return True
+        if _encode_file_header(file_path, header, mode, journal, target_path):
+            return True
+        log_callback(f"文件 {file_path.name} 不是解密后的UnityFS文件，跳过")
+        return False
     except Exception as e:
         log_callback(f"加密文件 {file_path.name} 时出错: {str(e)}")
         return False
 
 
-def encode(game_bundles_path: Path, cache_file, log_callback):
+def _encode_file_header(file_path: Path, header, mode, journal, target_path=None):
+    """
+    在文件开头恢复文件头
+    
+    只处理以UnityFS签名开头（即已解密）的文件，避免重复添加文件头；
+    写入后检查临时文件大小，不一致时回滚，原文件保持不变。
+    输出到其他目录时，不需要修改的文件以链接的方式放到输出目录
+    
+    Returns:
+        bool: 是否已加密，文件不是解密后的UnityFS文件时返回False
+    
+    Raises:
+        Exception: 读写文件出错，原文件保持不变
+    """
+    if target_path is not None:
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, "rb") as f:
+        head = f.read(len(UNITYFS_SIGNATURE) + 1)
+    if scan_unityFS_signatures(head, max_hits=1) != [0]:
+        if target_path is not None:
+            link_file(file_path, target_path)
+        return False
+    if not header:
+        if target_path is not None:
+            link_file(file_path, target_path)
+        return True
+    
+    expected_size = len(header) + os.path.getsize(file_path)
+    with atomic_output(target_path or file_path, journal, file_path) as out:
+        _RESTORE_FUNCTIONS[mode](file_path, header, out)
+        written = os.fstat(out.fileno()).st_size
+        if written != expected_size:
+            raise IOError(f"写入 {written} 字节，应为 {expected_size} 字节")
+    return True
+
+
+def encode(game_bundles_path: Path, cache_file, log_callback, mode=IO_MODE_MEMORY, resume=True,
+           backend=BACKEND_AUTO, batch_size=None, max_workers=None, queue_depth=None, file_filter=None,
+           verify=False, output_dir=None):
     """
     加密目录下的所有资源文件
     
@@ -186,73 +1070,162 @@ def encode(game_bundles_path: Path, cache_file, log_callback):
         game_bundles_path: 游戏资源目录
         cache_file: 目录索引缓存文件
         log_callback: 日志回调函数
+        mode: 读写模式，IO_MODES之一
+        resume: 是否跳过上次中断的运行中已完成的文件
+        backend: 执行后端，BACKENDS之一
+        batch_size: 每批提交的文件数量，默认根据文件数量和工作者数量计算
+        max_workers: 工作者数量，默认使用configure_executors设置的值
+        queue_depth: 同时提交的最大批次数，默认使用configure_executors设置的值
+        file_filter: 文件筛选规则（FileFilter），默认处理所有文件
+        verify: 是否将加密后的文件与解密时记录的原文件哈希比较
+        output_dir: 输出目录，设置时原目录保持不变，加密后的文件写入输出目录的相同相对位置，
+                    其他文件以reflink/硬链接的方式放到输出目录
+    
+    Returns:
+        dict: 统计信息{"successful", "skipped", "failed", "resumed", "matched", "mismatched"}，
+              参数错误、目录不存在或索引无法读取时返回None
     """
     if log_callback is None:
         log_callback = print
     
+    if mode not in IO_MODES:
+        log_callback(f"错误: 不支持的读写模式 {mode}\n")
+        return None
+    
+    if not _check_backend(backend, log_callback):
+        return None
+    
     # 确保路径存在
     if not game_bundles_path.exists():
         log_callback(f"错误: 路径 {game_bundles_path} 不存在\n")
-        return
+        return None
     
     # 读取index_cache文件
     try:
-        with open(cache_file, "r", encoding="utf-8") as f:
-            cache_data = ujson.load(f)
+        index = IndexCache.load(cache_file)
     except Exception as e:
         log_callback(f"加载index_cache文件时出错: {str(e)}\n")
-        return
+        return None
+    IndexStore().touch(cache_file)
+    if verify and index.hash_algorithm != HASH_ALGORITHM:
+        log_callback(f"索引中的原文件哈希算法为 {index.hash_algorithm or '无'}，当前为 {HASH_ALGORITHM}，无法校验\n")
+        verify = False
+    
+    output_dir = _check_output_dir(game_bundles_path, output_dir, log_callback)
+    if output_dir is False:
+        return None
+    work_dir = output_dir or game_bundles_path
+    
+    run_journal = ProgressJournal.for_directory(work_dir, "encode")
+    journal = _open_inflight_journal(work_dir, "encode", log_callback, run_journal)
     
     log_callback(f"正在扫描目录: {game_bundles_path}\n")
     log_callback(f"使用索引文件: {cache_file}\n")
     start_time = time.time()
     
-    # 收集要加密的文件
+    # 收集要加密的文件及解密时去除的文件头
+    headers = {}
     bundle_files = []
-    for rel_path in cache_data.keys():
+    missing_header = 0
+    for rel_path, _, offset, header, original_hash in index.entries():
+        # 不是UnityFS文件的文件解密时没有修改，不需要加密
+        if offset == OFFSET_NOT_BUNDLE:
+            continue
+        if file_filter is not None and not file_filter.match_path(os.path.basename(rel_path), rel_path):
+            continue
         file_path = game_bundles_path / rel_path
-        if file_path.exists() and file_path.is_file():
-            bundle_files.append(file_path)
+        try:
+            st = file_path.stat()
+        except OSError:
+            continue
+        if not stat.S_ISREG(st.st_mode):
+            continue
+        if file_filter is not None and not file_filter.match_size(st.st_size):
+            continue
+        if header is None:
+            # 旧版本的索引或解密时已经没有前缀且没有更早的记录，无法还原
+            missing_header += 1
+            continue
+        bundle_files.append(file_path)
+        headers[file_path] = (header, original_hash if verify else None)
     
+    if missing_header:
+        log_callback(f"{missing_header} 个文件在索引中没有记录文件头，已跳过\n")
     if not bundle_files:
         log_callback("未找到需要加密的文件\n")
-        return
+        return {"successful": 0, "skipped": 0, "failed": 0, "resumed": 0, "matched": 0, "mismatched": 0}
     
     log_callback(f"找到 {len(bundle_files)} 个文件需要加密\n")
+    pending_files = _filter_finished_files(game_bundles_path, bundle_files, run_journal, resume, log_callback)
     log_callback("开始加密资源文件...\n")
     
-    # 加载标准Header
-    with open(os.path.join(os.path.dirname(__file__), "..", "..", "resources", "header.txt"), "r") as f:
-        header = f.read().strip()
-    header_binary = unhexlify(header)
-    header_len = 336
-    
     # 计数器
     successful = 0
+    skipped = 0
     failed = 0
-    total = len(bundle_files)
+    matched = 0
+    mismatched = []
+    resumed = len(bundle_files) - len(pending_files)
+    total = len(pending_files)
     last_progress = 0
+    last_progress_time = time.time()
     
-    # 提交所有任务
-    futures = {ENCRYPT_EXECUTOR.submit(encode_file, file, header_len, log_callback): file for file in bundle_files}
+    # 按滑动窗口分批提交任务，任务在需要时才生成
+    backend = resolve_backend(backend, total)
+    items = (
+        (file, *headers[file], output_dir / file.relative_to(game_bundles_path) if output_dir is not None else None)
+        for file in pending_files
+    )
     
-    # 处理结果
-    for i, future in enumerate(as_completed(futures), 1):
-        file = futures[future]
-        try:
-            result = future.result()
-            if result:
+    with open_executor(backend, "Encrypt", max_workers) as executor:
+        batch_size = batch_size or default_batch_size(total, executor_workers(executor))
+        batch_results = iter_batch_results(
+            executor, _encode_batch, items, batch_size, (mode, journal), log_callback, queue_depth
+        )
+        
+        # 处理结果
+        for i, (file, outcome) in enumerate(batch_results, 1):
+            if isinstance(outcome, Exception):
+                failed += 1
+                log_callback(f"处理 {file.name} 时出错: {str(outcome)}")
+            elif outcome[0]:
                 successful += 1
-                # 仅在完成重要进度时输出日志
-                progress = int(i / total * 100)
-                if progress >= last_progress + 10 or i == total:
-                    log_callback(f"进度: {progress}% ({i}/{total})")
-                    last_progress = progress
-        except Exception as e:
-            failed += 1
-            log_callback(f"处理 {file.name} 时出错: {str(e)}")
+                run_journal.mark_finished(str(file.relative_to(game_bundles_path)), file)
+                if outcome[1]:
+                    matched += 1
+                elif outcome[1] is not None:
+                    mismatched.append(file)
+                    log_callback(f"校验不一致: {file.relative_to(game_bundles_path)}")
+            else:
+                skipped += 1
+            
+            # 仅在完成重要进度时输出日志
+            progress = int(i / total * 100)
+            now = time.time()
+            if progress >= last_progress + 10 or i == total or now - last_progress_time >= PROGRESS_LOG_INTERVAL:
+                log_callback(f"进度: {progress}% ({i}/{total})")
+                last_progress = progress
+                last_progress_time = now
+    
+    # 所有文件都已替换或回滚，清除进行中文件日志
+    journal.clear()
+    _close_run_journal(run_journal, failed)
+    
+    if output_dir is not None:
+        processed = [str(file.relative_to(game_bundles_path)) for file in bundle_files]
+        _mirror_unprocessed(game_bundles_path, output_dir, processed, log_callback)
     
     # 打印统计信息
     elapsed = time.time() - start_time
     log_callback(f"\n加密完成! 耗时: {elapsed:.2f}秒")
-    log_callback(f"成功: {successful}, 失败: {failed}\n") 
\ No newline at end of file
+    log_callback(f"成功: {successful}, 跳过: {skipped}, 失败: {failed}, 续跑跳过: {resumed}\n")
+    if verify:
+        log_callback(f"校验一致: {matched}, 不一致: {len(mismatched)}, 未记录哈希: {successful - matched - len(mismatched)}\n")
+    return {
+        "successful": successful,
+        "skipped": skipped,
+        "failed": failed,
+        "resumed": resumed,
+        "matched": matched,
+        "mismatched": len(mismatched),
+    }
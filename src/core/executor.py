@@ -0,0 +1,256 @@
+"""
+任务执行后端模块，提供线程池/进程池两种后端和分批提交任务的功能
+"""
+import os
+import threading
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+CPU_COUNT = os.cpu_count() or 4
+
+# 执行后端
+BACKEND_THREAD = "thread"    # 线程池，适合I/O密集的任务，可直接回调日志
+BACKEND_PROCESS = "process"  # 进程池，签名搜索等CPU密集的工作可以用满所有核心
+BACKEND_AUTO = "auto"        # 根据文件数量和CPU核心数自动选择
+BACKENDS = (BACKEND_THREAD, BACKEND_PROCESS, BACKEND_AUTO)
+
+# 自动模式下文件数量达到该值且有多个CPU核心时使用进程池
+AUTO_PROCESS_MIN_FILES = 256
+
+# 每批文件数量的上限，批次越大进程间传递参数的开销越小，但进度反馈越不及时
+MAX_BATCH_SIZE = 256
+
+# 边遍历边处理、文件总数未知时的每批文件数量
+STREAMING_BATCH_SIZE = 16
+
+# 常驻线程池，首次使用时才创建
+_thread_executors = {}
+_executors_lock = threading.Lock()
+
+# 通过configure_executors设置的并发参数，None表示使用默认值
+_settings = {"max_workers": None, "queue_depth": None}
+
+
+def configure_executors(max_workers=None, queue_depth=None):
+    """
+    设置默认并发参数
+
+    工作者数量变化时关闭已创建的常驻线程池，下次使用时按新的数量重新创建
+
+    Args:
+        max_workers: 工作者数量，None或0表示使用默认值
+        queue_depth: 同时提交给执行器的最大批次数，None或0表示使用默认值
+    """
+    max_workers = max_workers or None
+    with _executors_lock:
+        if max_workers != _settings["max_workers"]:
+            for executor in _thread_executors.values():
+                executor.shutdown(wait=False)
+            _thread_executors.clear()
+        _settings["max_workers"] = max_workers
+        _settings["queue_depth"] = queue_depth or None
+
+
+def default_workers(backend):
+    """
+    获取执行后端的默认工作者数量
+
+    Args:
+        backend: BACKEND_THREAD或BACKEND_PROCESS
+
+    Returns:
+        int: 工作者数量
+    """
+    if _settings["max_workers"]:
+        return _settings["max_workers"]
+    # 线程后端的任务大部分时间在等待I/O，使用两倍于核心数的线程
+    return CPU_COUNT if backend == BACKEND_PROCESS else CPU_COUNT * 2
+
+
+def default_queue_depth(workers):
+    """
+    获取同时提交给执行器的最大批次数
+
+    Args:
+        workers: 工作者数量
+
+    Returns:
+        int: 最大批次数
+    """
+    return _settings["queue_depth"] or workers * 2
+
+
+def get_thread_executor(name):
+    """
+    获取常驻线程池，第一次调用时才创建
+
+    Args:
+        name: 线程池名称，同时作为线程名前缀
+
+    Returns:
+        ThreadPoolExecutor: 线程池
+    """
+    with _executors_lock:
+        executor = _thread_executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=default_workers(BACKEND_THREAD), thread_name_prefix=f"{name}Thread"
+            )
+            _thread_executors[name] = executor
+        return executor
+
+
+def shutdown_executors(wait=True):
+    """
+    关闭所有常驻线程池
+
+    Args:
+        wait: 是否等待正在执行的任务完成
+    """
+    with _executors_lock:
+        executors = list(_thread_executors.values())
+        _thread_executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+
+def resolve_backend(backend, total):
+    """
+    确定实际使用的执行后端
+
+    Args:
+        backend: BACKENDS之一
+        total: 需要处理的文件数量
+
+    Returns:
+        str: BACKEND_THREAD或BACKEND_PROCESS
+    """
+    if backend == BACKEND_AUTO:
+        if CPU_COUNT > 1 and total >= AUTO_PROCESS_MIN_FILES:
+            return BACKEND_PROCESS
+        return BACKEND_THREAD
+    return backend
+
+
+def default_batch_size(total, workers):
+    """
+    计算每批文件数量，保证每个工作者能分到多个批次以均衡负载
+
+    Args:
+        total: 需要处理的文件数量，未知时为None
+        workers: 工作者数量
+
+    Returns:
+        int: 每批文件数量
+    """
+    if total is None:
+        return STREAMING_BATCH_SIZE
+    return max(1, min(MAX_BATCH_SIZE, total // (workers * 4)))
+
+
+def open_executor(backend, name, max_workers=None):
+    """
+    打开执行后端对应的执行器
+
+    线程后端默认复用常驻线程池，指定了与默认值不同的工作者数量时为本次运行单独创建线程池；
+    进程后端为本次运行创建进程池。本次运行创建的执行器在退出时关闭
+
+    Args:
+        backend: BACKEND_THREAD或BACKEND_PROCESS
+        name: 常驻线程池名称
+        max_workers: 工作者数量，None表示使用默认值
+
+    Returns:
+        上下文管理器，进入时返回执行器
+    """
+    workers = max_workers or default_workers(backend)
+    if backend == BACKEND_PROCESS:
+        # 进程池依赖multiprocessing，只在使用进程后端时导入
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(max_workers=workers)
+    if workers != default_workers(BACKEND_THREAD):
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}Thread")
+    return nullcontext(get_thread_executor(name))
+
+
+def executor_workers(executor):
+    """
+    获取执行器的工作者数量
+
+    Args:
+        executor: ThreadPoolExecutor或ProcessPoolExecutor
+
+    Returns:
+        int: 工作者数量
+    """
+    return getattr(executor, "_max_workers", CPU_COUNT)
+
+
+def iter_batches(items, batch_size):
+    """
+    将任务迭代器按批次切分，不需要预先知道任务总数
+
+    Args:
+        items: 任务的可迭代对象
+        batch_size: 每批任务数量
+
+    Yields:
+        list: 一批任务
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_batch_results(executor, batch_func, items, batch_size, args, log_callback, queue_depth=None):
+    """
+    将任务分批提交给执行器，并按完成顺序逐个返回每个文件的结果
+
+    使用滑动窗口调度：任务按需从items中取出，同时最多只有queue_depth个批次在执行器中，
+    每完成一个批次就补充提交新的批次，内存占用不随任务总数增长，第一个批次完成后即可得到结果。
+
+    batch_func(batch_items, *args)需要是模块级函数（进程后端需要序列化），
+    返回(结果列表, 日志消息列表)，日志消息在调用方线程中输出
+
+    Args:
+        executor: 执行器
+        batch_func: 处理一批任务的函数
+        items: 任务的可迭代对象（可以是生成器），每项为元组，第一个元素为文件路径
+        batch_size: 每批任务数量
+        args: 传给batch_func的其他参数
+        log_callback: 日志回调函数
+        queue_depth: 同时提交的最大批次数，默认根据执行器的工作者数量计算
+
+    Yields:
+        tuple: (文件路径, 结果)，批次执行出错时结果为异常对象
+    """
+    queue_depth = queue_depth or default_queue_depth(executor_workers(executor))
+    batches = iter_batches(items, batch_size)
+    futures = {}
+
+    while True:
+        # 补充提交任务直到达到队列深度
+        for batch in batches:
+            futures[executor.submit(batch_func, batch, *args)] = batch
+            if len(futures) >= queue_depth:
+                break
+        if not futures:
+            return
+
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            batch = futures.pop(future)
+            try:
+                results, messages = future.result()
+            except Exception as e:
+                for item in batch:
+                    yield item[0], e
+                continue
+            for message in messages:
+                log_callback(message)
+            for item, result in zip(batch, results):
+                yield item[0], result
@@ -0,0 +1,123 @@
+"""
+文件筛选规则模块，支持glob/正则表达式的包含、排除规则和文件大小范围
+"""
+import fnmatch
+import os
+import re
+
+# 解密时默认不处理的文件后缀
+EXCLUDED_SUFFIXES = (".meta", ".manifest", ".json")
+
+# 以该前缀开头的规则按正则表达式处理，否则按glob处理
+REGEX_PREFIX = "re:"
+
+
+def _compile_rules(patterns):
+    """
+    将多条规则编译为三个正则表达式：文件名glob、相对路径glob和相对路径正则
+
+    不含"/"的glob只匹配文件名（如"prefabs_spine_*"可匹配任意目录下的文件），
+    含"/"的glob匹配整个以"/"分隔的相对路径，正则表达式可以只匹配相对路径的一部分
+
+    Args:
+        patterns: 规则列表
+
+    Returns:
+        tuple: (文件名正则, 相对路径glob正则, 相对路径正则)，没有对应规则时为None
+    """
+    name_parts = []
+    glob_parts = []
+    regex_parts = []
+    for pattern in patterns:
+        if pattern.startswith(REGEX_PREFIX):
+            regex_parts.append(f"(?:{pattern[len(REGEX_PREFIX):]})")
+        elif "/" in pattern:
+            glob_parts.append(f"(?:{fnmatch.translate(pattern)})")
+        else:
+            name_parts.append(f"(?:{fnmatch.translate(pattern)})")
+    return tuple(re.compile("|".join(parts)) if parts else None for parts in (name_parts, glob_parts, regex_parts))
+
+
+def _matches(rules, name, rel_path):
+    name_regex, glob_regex, path_regex = rules
+    if name_regex is not None and name_regex.fullmatch(name):
+        return True
+    # fnmatch.translate只锚定结尾，路径glob需要完整匹配，否则"sub/*"会匹配"xsub/a"和"deep/sub/a"
+    if glob_regex is not None and glob_regex.fullmatch(rel_path):
+        return True
+    return path_regex is not None and path_regex.search(rel_path) is not None
+
+
+class FileFilter:
+    """
+    文件筛选规则
+
+    规则在创建时编译一次，遍历目录时对每个文件只做正则匹配；
+    只有设置了大小范围时才需要文件大小
+    """
+
+    def __init__(self, include=(), exclude=(), min_size=None, max_size=None,
+                 exclude_suffixes=EXCLUDED_SUFFIXES, paths=None):
+        """
+        初始化筛选规则
+
+        Args:
+            include: 包含规则列表，为空时包含所有文件
+            exclude: 排除规则列表，优先于包含规则
+            min_size: 最小文件大小（字节），None表示不限制
+            max_size: 最大文件大小（字节），None表示不限制
+            exclude_suffixes: 直接排除的文件后缀
+            paths: 相对路径列表（如分类清单中的加密文件），设置时只包含列表中的文件
+        """
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.exclude_suffixes = tuple(exclude_suffixes)
+        self._include_rules = _compile_rules(self.include) if self.include else None
+        self._exclude_rules = _compile_rules(self.exclude) if self.exclude else None
+        self.paths = frozenset(path.replace("\\", "/") for path in paths) if paths is not None else None
+
+    @property
+    def needs_size(self):
+        """是否需要文件大小才能判断"""
+        return self.min_size is not None or self.max_size is not None
+
+    def match_path(self, name, rel_path):
+        """
+        根据文件名和相对路径判断文件是否符合规则
+
+        Args:
+            name: 文件名
+            rel_path: 文件相对根目录的路径
+
+        Returns:
+            bool: 是否符合规则
+        """
+        if self.exclude_suffixes and name.endswith(self.exclude_suffixes):
+            return False
+        if os.sep != "/":
+            rel_path = rel_path.replace(os.sep, "/")
+        if self.paths is not None and rel_path not in self.paths:
+            return False
+        if self._exclude_rules is not None and _matches(self._exclude_rules, name, rel_path):
+            return False
+        if self._include_rules is not None and not _matches(self._include_rules, name, rel_path):
+            return False
+        return True
+
+    def match_size(self, size):
+        """
+        判断文件大小是否在范围内
+
+        Args:
+            size: 文件大小（字节）
+
+        Returns:
+            bool: 是否在范围内
+        """
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        return True
@@ -0,0 +1,197 @@
+"""
+文件指纹索引模块，记录目录中每个文件的大小、修改时间和快速哈希，用于增量处理
+"""
+import os
+from pathlib import Path
+
+import ujson
+
+from src.core.journal import directory_key
+from src.utils.file_utils import atomic_output
+from src.utils.hash_utils import HASH_ALGORITHM, file_hash, file_hashes
+
+# 指纹索引文件目录
+FINGERPRINT_DIR = Path("cache") / "fingerprint"
+
+# 指纹索引格式版本
+FINGERPRINT_VERSION = 1
+
+# 文件相对上次运行的状态
+STATUS_ADDED = "added"
+STATUS_CHANGED = "changed"
+STATUS_UNCHANGED = "unchanged"
+
+
+def compute_fingerprint(file_path: Path):
+    """
+    计算文件指纹
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        list: [大小, 修改时间(纳秒), 快速哈希]
+    """
+    st = os.stat(file_path)
+    return [st.st_size, st.st_mtime_ns, file_hash(file_path)]
+
+
+def compute_fingerprint_with_original(file_path: Path, prefix):
+    """
+    计算解密后文件的指纹，同时计算原文件（前缀+解密后内容）的快速哈希，只读取一遍文件
+
+    Args:
+        file_path: 解密后的文件路径
+        prefix: 解密时去除的前缀
+
+    Returns:
+        tuple: (指纹, 原文件的十六进制哈希)
+    """
+    st = os.stat(file_path)
+    digest, original_hash = file_hashes(file_path, (b"", prefix))
+    return [st.st_size, st.st_mtime_ns, digest], original_hash
+
+
+def check_fingerprint(file_path: Path, previous):
+    """
+    将文件与上次记录的指纹比较
+
+    大小和修改时间都相同时直接认为未变化，不读取文件；
+    只有修改时间不同而大小相同时才计算哈希确认内容是否变化。
+
+    Args:
+        file_path: 文件路径
+        previous: 上次记录的指纹，没有记录时为None
+
+    Returns:
+        tuple: (状态, 未变化时的最新指纹或None)
+    """
+    if previous is None:
+        return STATUS_ADDED, None
+    st = os.stat(file_path)
+    size, mtime_ns, digest = previous
+    if st.st_size != size:
+        return STATUS_CHANGED, None
+    if st.st_mtime_ns == mtime_ns:
+        return STATUS_UNCHANGED, previous
+    if digest and file_hash(file_path) == digest:
+        return STATUS_UNCHANGED, [size, st.st_mtime_ns, digest]
+    return STATUS_CHANGED, None
+
+
+class FingerprintIndex:
+    """
+    文件指纹索引类
+
+    每个目标目录对应一个索引文件，键为文件相对目录的路径。
+    """
+
+    def __init__(self, index_file: Path):
+        """
+        初始化指纹索引
+
+        Args:
+            index_file: 索引文件路径
+        """
+        self.index_file = Path(index_file)
+        self._previous = {}
+        self._current = {}
+
+    @classmethod
+    def for_directory(cls, directory: Path):
+        """
+        获取目标目录对应的指纹索引
+
+        Args:
+            directory: 目标目录
+
+        Returns:
+            FingerprintIndex: 指纹索引对象
+        """
+        return cls(FINGERPRINT_DIR / f"fingerprint_{directory_key(directory)}.json")
+
+    def load(self):
+        """
+        读取上次保存的指纹
+
+        Returns:
+            int: 已记录的文件数量
+        """
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = ujson.load(f)
+        except (FileNotFoundError, ValueError):
+            data = {}
+        if data.get("version") != FINGERPRINT_VERSION:
+            self._previous = {}
+        else:
+            files = data.get("files", {})
+            if data.get("hash_algorithm") != HASH_ALGORITHM:
+                # 哈希算法变化后只能比较大小和修改时间
+                files = {rel: [size, mtime_ns, ""] for rel, (size, mtime_ns, _) in files.items()}
+            self._previous = files
+        self._current = {}
+        return len(self._previous)
+
+    def get(self, rel_path):
+        """
+        获取文件上次记录的指纹
+
+        Args:
+            rel_path: 文件相对目标目录的路径
+
+        Returns:
+            list: 指纹，没有记录时返回None
+        """
+        return self._previous.get(rel_path)
+
+    def current(self, rel_path):
+        """
+        获取文件本次运行记录的指纹
+
+        Args:
+            rel_path: 文件相对目标目录的路径
+
+        Returns:
+            list: 指纹，本次没有记录时返回None
+        """
+        return self._current.get(rel_path)
+
+    def update(self, rel_path, fingerprint):
+        """
+        记录文件本次运行后的指纹
+
+        Args:
+            rel_path: 文件相对目标目录的路径
+            fingerprint: 指纹
+        """
+        self._current[rel_path] = fingerprint
+
+    def update_from_stat(self, rel_path, file_path: Path):
+        """
+        只根据大小和修改时间记录文件指纹，不读取文件内容
+
+        Args:
+            rel_path: 文件相对目标目录的路径
+            file_path: 文件路径
+        """
+        st = os.stat(file_path)
+        self._current[rel_path] = [st.st_size, st.st_mtime_ns, ""]
+
+    def save(self, prune=True):
+        """
+        保存本次运行记录的指纹
+
+        Args:
+            prune: 是否删除本次没有出现的文件的指纹；只处理了部分文件时应为False
+        """
+        if not prune:
+            for rel_path, fingerprint in self._previous.items():
+                self._current.setdefault(rel_path, fingerprint)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_output(self.index_file) as f:
+            f.write(ujson.dumps({
+                "version": FINGERPRINT_VERSION,
+                "hash_algorithm": HASH_ALGORITHM,
+                "files": self._current,
+            }, ensure_ascii=False).encode("utf-8"))
@@ -2,11 +2,228 @@
 图像处理核心功能模块
 """
 import os
+import time
 from pathlib import Path
 import threading
+from concurrent.futures import FIRST_COMPLETED, wait
 from PIL import Image
 import numpy as np
 
+from src.core.executor import BACKEND_AUTO, BACKENDS, CPU_COUNT, open_executor, resolve_backend
+
+
+# 像素转换的计算方式
+KERNEL_ARITHMETIC = "arithmetic"  # 向量化整数运算
+KERNEL_LUT = "lut"                # 按(除数或alpha, 颜色)查表
+KERNEL_AUTO = "auto"              # 第一次使用时测试两种方式的速度，选择较快的一种
+KERNELS = (KERNEL_ARITHMETIC, KERNEL_LUT, KERNEL_AUTO)
+
+# 选择计算方式时测试用的图像边长和重复次数
+BENCHMARK_SIZE = 512
+BENCHMARK_REPEAT = 3
+
+# 分条处理时每条包含的像素数，分条处理的额外内存只与条的大小有关
+STRIP_PIXELS = 1024 * 1024
+
+# 处理一个图像时每个像素（分条处理时为条中的每个像素）额外需要的字节数，
+# 包括像素数组、uint16中间结果或查表下标和转换结果
+WORKING_BYTES_PER_PIXEL = 24
+
+# 批量处理图像的内存上限，无法获取可用内存时使用默认值
+DEFAULT_MEMORY_LIMIT = 2 * 1024 * 1024 * 1024
+MIN_MEMORY_LIMIT = 256 * 1024 * 1024
+
+# 查表用的256x256表格和自动选择的计算方式，第一次使用时生成
+_lookup_tables = {}
+_selected_kernels = {}
+_kernels_lock = threading.Lock()
+
+
+def _divide_by_255(values):
+    """
+    原地计算values // 255，用乘法和移位代替整数除法
+
+    对0到255*255之间的整数结果与整数除法完全相同，中间结果不超过uint16的范围
+
+    Args:
+        values: uint16数组，每个元素不超过255*255
+
+    Returns:
+        numpy.ndarray: 原数组
+    """
+    high = values >> 8
+    values += 1
+    values += high
+    values >>= 8
+    return values
+
+
+def _lookup_table(name):
+    """
+    获取查找表，表格展开为一维，下标为(行 << 8) | 颜色
+
+    premultiply的行为alpha，值为c * a // 255；
+    straighten的行为除数d，值为c * 255 // d（c不超过d），第0行不会用到，保持原值
+
+    Args:
+        name: "premultiply"或"straighten"
+
+    Returns:
+        numpy.ndarray: 长度为65536的uint8数组
+    """
+    table = _lookup_tables.get(name)
+    if table is not None:
+        return table
+    colors = np.arange(256, dtype=np.uint32)
+    if name == "premultiply":
+        values = colors[:, None] * colors[None, :] // 255
+    else:
+        divisors = colors.copy()
+        divisors[0] = 255
+        values = np.minimum(colors[None, :] * 255 // divisors[:, None], 255)
+    table = values.astype(np.uint8).ravel()
+    _lookup_tables[name] = table
+    return table
+
+
+def _apply_lookup_table(matrix, table, rows):
+    """
+    按(rows, 颜色)查表替换颜色通道，逐个通道处理以减少临时数组
+
+    Args:
+        matrix: 形状为(高, 宽, 4)的uint8数组
+        table: _lookup_table返回的表格
+        rows: 形状为(高, 宽)的表格行号数组
+    """
+    base = rows.astype(np.intp)
+    base <<= 8
+    for channel in range(3):
+        matrix[..., channel] = table[base | matrix[..., channel]]
+
+
+def _premultiply_arithmetic(matrix):
+    # 四个通道一起计算比只取颜色通道的跨步视图更快，alpha通道计算后再恢复
+    values = matrix.astype(np.uint16)
+    values *= matrix[..., 3:4]
+    _divide_by_255(values)
+    values[..., 3] = matrix[..., 3]
+    matrix[...] = values
+    return matrix
+
+
+def _premultiply_lut(matrix):
+    _apply_lookup_table(matrix, _lookup_table("premultiply"), matrix[..., 3])
+    return matrix
+
+
+def _straighten_divisor(matrix):
+    """
+    计算每个像素的除数max(r, g, b, a)，alpha为0的像素除数取255使颜色保持不变
+    """
+    alpha = matrix[..., 3]
+    divisor = np.maximum(matrix[..., 0], matrix[..., 1])
+    np.maximum(divisor, matrix[..., 2], out=divisor)
+    np.maximum(divisor, alpha, out=divisor)
+    divisor[alpha == 0] = 255
+    return divisor
+
+
+def _straighten_arithmetic(matrix):
+    divisor = _straighten_divisor(matrix)
+    values = matrix.astype(np.uint16)
+    values *= 255
+    values //= divisor[..., None]
+    values[..., 3] = matrix[..., 3]
+    matrix[...] = values
+    return matrix
+
+
+def _straighten_lut(matrix):
+    _apply_lookup_table(matrix, _lookup_table("straighten"), _straighten_divisor(matrix))
+    return matrix
+
+
+_KERNEL_FUNCTIONS = {
+    "premultiply": {KERNEL_ARITHMETIC: _premultiply_arithmetic, KERNEL_LUT: _premultiply_lut},
+    "straighten": {KERNEL_ARITHMETIC: _straighten_arithmetic, KERNEL_LUT: _straighten_lut},
+}
+
+
+def _benchmark_kernels(name):
+    """
+    在随机图像上测试各计算方式的耗时，返回最快的计算方式
+
+    Args:
+        name: "premultiply"或"straighten"
+
+    Returns:
+        str: KERNEL_ARITHMETIC或KERNEL_LUT
+    """
+    sample = np.random.default_rng(0).integers(0, 256, (BENCHMARK_SIZE, BENCHMARK_SIZE, 4), dtype=np.uint8)
+    timings = {}
+    for kernel, function in _KERNEL_FUNCTIONS[name].items():
+        best = float("inf")
+        for _ in range(BENCHMARK_REPEAT):
+            matrix = sample.copy()
+            start = time.perf_counter()
+            function(matrix)
+            best = min(best, time.perf_counter() - start)
+        timings[kernel] = best
+    return min(timings, key=timings.get)
+
+
+def _resolve_kernel(name, kernel):
+    """
+    获取计算方式对应的函数，自动模式下第一次使用时测试并记住较快的计算方式
+
+    Args:
+        name: "premultiply"或"straighten"
+        kernel: KERNELS之一
+
+    Returns:
+        callable: 原地转换像素数组的函数
+    """
+    if kernel == KERNEL_AUTO:
+        kernel = _selected_kernels.get(name)
+        if kernel is None:
+            with _kernels_lock:
+                kernel = _selected_kernels.get(name)
+                if kernel is None:
+                    # 生成查找表的时间不计入测试
+                    _lookup_table(name)
+                    kernel = _benchmark_kernels(name)
+                    _selected_kernels[name] = kernel
+    try:
+        return _KERNEL_FUNCTIONS[name][kernel]
+    except KeyError:
+        raise ValueError(f"不支持的计算方式 {kernel}") from None
+
+
+def selected_kernels():
+    """
+    获取自动模式下已选择的计算方式
+
+    Returns:
+        dict: {"premultiply"或"straighten": KERNEL_ARITHMETIC或KERNEL_LUT}，尚未使用的转换不包含在内
+    """
+    return dict(_selected_kernels)
+
+
+def premultiply_pixels(matrix, kernel=KERNEL_AUTO):
+    """
+    原地将RGBA像素数组从直通透明转换为预乘透明
+
+    每个颜色通道计算c * a // 255，alpha为0时颜色为0，alpha为255时颜色不变
+
+    Args:
+        matrix: 形状为(高, 宽, 4)的uint8数组
+        kernel: 计算方式，KERNELS之一，各计算方式的结果完全相同
+
+    Returns:
+        numpy.ndarray: 原数组
+    """
+    return _resolve_kernel("premultiply", kernel)(matrix)
+
 
 def premultiply_alpha(img):
     """
@@ -18,18 +235,26 @@ def premultiply_alpha(img):
     Returns:
         PIL.Image: 处理后的图像
     """
-    matrix = np.array(img, dtype=int)
-    for row in matrix:
-        for pixel in row:
-            if pixel[3] == 255:
-                continue
-            elif pixel[3] == 0:
-                pixel[0] = pixel[1] = pixel[2] = 0
-            else:
-                for i in range(3):
-                    pixel[i] = pixel[i] * pixel[3] // 255
-    matrix = matrix.astype("uint8")
-    return Image.fromarray(matrix)
+    matrix = np.array(img, dtype=np.uint8)
+    return Image.fromarray(premultiply_pixels(matrix))
+
+
+def straighten_pixels(matrix, kernel=KERNEL_AUTO):
+    """
+    原地将RGBA像素数组从预乘透明转换为直通透明
+
+    alpha为0或255的像素不变；其他像素的颜色通道计算c * 255 // d，
+    d为alpha，颜色通道的最大值maxrgb超过alpha时d为maxrgb（最大的颜色通道变为255）。
+    两种情况的除数都是max(maxrgb, alpha)，alpha为0的像素除数取255使颜色保持不变
+
+    Args:
+        matrix: 形状为(高, 宽, 4)的uint8数组
+        kernel: 计算方式，KERNELS之一，各计算方式的结果完全相同
+
+    Returns:
+        numpy.ndarray: 原数组
+    """
+    return _resolve_kernel("straighten", kernel)(matrix)
 
 
 def straight_alpha(img):
@@ -42,23 +267,41 @@ def straight_alpha(img):
     Returns:
         PIL.Image: 处理后的图像
     """
-    matrix = np.array(img)
-    for row in matrix:
-        for pixel in row:
-            rgb = pixel[:-1]
-            alpha = pixel[-1]
-            if alpha != 0 and alpha != 255:
-                maxrgb = max(rgb)
-                if maxrgb > alpha:
-                    for i in range(3):
-                        pixel[i] = rgb[i] * 255 // maxrgb
-                else:
-                    for i in range(3):
-                        pixel[i] = rgb[i] * 255 // alpha
-    return Image.fromarray(matrix)
+    matrix = np.array(img, dtype=np.uint8)
+    return Image.fromarray(straighten_pixels(matrix))
+
+
+def convert_image_strips(img, pixel_function, strip_pixels=STRIP_PIXELS):
+    """
+    按水平条原地转换RGBA图像
+
+    每次只取出一条像素转换后写回原图像，不需要整幅图像大小的numpy数组和中间结果
+
+    Args:
+        img: RGBA模式的PIL图像对象，会被修改
+        pixel_function: 原地转换像素数组的函数，如premultiply_pixels
+        strip_pixels: 每条包含的像素数
+
+    Returns:
+        PIL.Image: 原图像
+    """
+    width, height = img.size
+    rows = max(1, strip_pixels // max(1, width))
+    for top in range(0, height, rows):
+        box = (0, top, width, min(height, top + rows))
+        matrix = np.array(img.crop(box), dtype=np.uint8)
+        img.paste(Image.fromarray(pixel_function(matrix)), box)
+    return img
+
 
+# 支持分条处理的转换函数对应的像素转换函数
+_PIXEL_FUNCTIONS = {
+    premultiply_alpha: premultiply_pixels,
+    straight_alpha: straighten_pixels,
+}
 
-def process_image_file(file_path, output_dir, conversion_function, log_callback=None):
+
+def process_image_file(file_path, output_dir, conversion_function, log_callback=None, strip_pixels=STRIP_PIXELS):
     """
     处理单个图像文件
     
@@ -67,6 +310,8 @@ def process_image_file(file_path, output_dir, conversion_function, log_callback=
         output_dir: 输出目录
         conversion_function: 转换函数
         log_callback: 日志回调函数
+        strip_pixels: 分条处理时每条包含的像素数，为None时整幅图像一起转换；
+                      只对premultiply_alpha和straight_alpha有效
         
     Returns:
         bool: 处理是否成功
@@ -87,8 +332,15 @@ def process_image_file(file_path, output_dir, conversion_function, log_callback=
                 log_callback(f"跳过 {file_path.name} - 不支持的图像模式: {img.mode}\n")
                 return False
         
-        # 应用转换
-        processed_img = conversion_function(img)
+        # 应用转换，内置的转换分条原地处理，峰值内存不随图像大小成倍增长
+        pixel_function = _PIXEL_FUNCTIONS.get(conversion_function)
+        if pixel_function is not None and strip_pixels:
+            img.load()
+            # 与整幅转换生成的新图像一致，保存时不带原文件的ICC配置等信息
+            img.info = {}
+            processed_img = convert_image_strips(img, pixel_function, strip_pixels)
+        else:
+            processed_img = conversion_function(img)
         
         # 创建输出目录
         output_dir.mkdir(parents=True, exist_ok=True)
@@ -104,14 +356,75 @@ def process_image_file(file_path, output_dir, conversion_function, log_callback=
         return False
 
 
-def batch_process_images(file_paths, conversion_function, log_callback=None):
+def default_memory_limit():
+    """
+    获取批量处理图像时默认的内存上限，为当前可用物理内存的一半
+
+    Returns:
+        int: 内存上限（字节），无法获取可用内存时返回DEFAULT_MEMORY_LIMIT
+    """
+    try:
+        available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return DEFAULT_MEMORY_LIMIT
+    return max(available // 2, MIN_MEMORY_LIMIT)
+
+
+def estimate_image_memory(file_path, strip_pixels=STRIP_PIXELS):
+    """
+    根据文件头中的图像尺寸估计处理一个图像需要的内存，不解码图像数据
+
+    Args:
+        file_path: 图像文件路径
+        strip_pixels: 分条处理时每条包含的像素数，为None时按整幅图像一起转换估计
+
+    Returns:
+        int: 估计的内存占用（字节），无法读取文件头时返回0
+    """
+    try:
+        with Image.open(file_path) as img:
+            width, height = img.size
+            bands = len(img.getbands())
+    except Exception:
+        return 0
+    pixels = width * height
+    # 解码后的图像，非RGBA图像转换为RGBA时两份同时存在
+    decoded = pixels * (4 if bands == 4 else bands + 4)
+    working = min(pixels, strip_pixels) if strip_pixels else pixels
+    return decoded + working * WORKING_BYTES_PER_PIXEL
+
+
+def _process_image_task(file_path, output_dir, conversion_function, strip_pixels):
+    """
+    处理单个图像文件，供线程池或进程池执行
+
+    Returns:
+        tuple: (处理是否成功, 日志消息列表)
+    """
+    messages = []
+    result = process_image_file(file_path, output_dir, conversion_function, messages.append, strip_pixels)
+    return result, messages
+
+
+def batch_process_images(file_paths, conversion_function, log_callback=None, output_dir=None,
+                         strip_pixels=STRIP_PIXELS, backend=BACKEND_AUTO, max_workers=None,
+                         memory_limit=None):
     """
     批量处理图像文件
     
+    使用固定数量的工作者处理，提交前根据文件头中的图像尺寸估计内存占用，
+    正在处理的图像估计内存之和不超过memory_limit，超出时等待其他图像处理完成再提交；
+    单个图像超过上限时只在没有其他图像处理时单独处理
+    
     Args:
         file_paths: 图像文件路径列表
-        conversion_function: 转换函数
+        conversion_function: 转换函数，使用进程后端时需要是模块级函数
         log_callback: 日志回调函数
+        output_dir: 输出目录，默认为当前目录下按转换类型命名的目录
+        strip_pixels: 分条处理时每条包含的像素数，为None时整幅图像一起转换
+        backend: 执行后端，BACKENDS之一，图像转换是CPU密集的工作，进程后端可以用满所有核心
+        max_workers: 工作者数量，默认为CPU核心数
+        memory_limit: 正在处理的图像估计内存之和的上限（字节），默认为可用物理内存的一半
         
     Returns:
         int: 成功处理的文件数量
@@ -119,38 +432,61 @@ def batch_process_images(file_paths, conversion_function, log_callback=None):
     if log_callback is None:
         log_callback = print
     
+    if backend not in BACKENDS:
+        log_callback(f"错误: 不支持的执行后端 {backend}\n")
+        return 0
+    
     # 创建输出目录
     conversion_name = "预乘透明" if conversion_function == premultiply_alpha else "直通透明"
-    output_dir = Path(f"output_{conversion_name}")
-    output_dir.mkdir(exist_ok=True)
+    output_dir = Path(output_dir) if output_dir is not None else Path(f"output_{conversion_name}")
+    output_dir.mkdir(parents=True, exist_ok=True)
     
-    log_callback(f"开始处理 {len(file_paths)} 个文件，转换为{conversion_name}...\n")
+    total = len(file_paths)
+    workers = max_workers or CPU_COUNT
+    memory_limit = memory_limit or default_memory_limit()
+    backend = resolve_backend(backend, total)
+    log_callback(f"开始处理 {total} 个文件，转换为{conversion_name}...\n")
     
-    # 创建线程列表
-    threads = []
     success_count = 0
+    pending = iter(file_paths)
+    next_file = None  # 因内存不足暂未提交的文件及其估计内存
+    running = {}      # 正在处理的任务: (文件路径, 估计内存)
+    running_memory = 0
     
-    # 创建线程锁，用于同步计数
-    lock = threading.Lock()
-    
-    def process_file(file_path):
-        nonlocal success_count
-        result = process_image_file(file_path, output_dir, conversion_function, log_callback)
-        if result:
-            with lock:
-                success_count += 1
-    
-    # 创建并启动线程
-    for file_path in file_paths:
-        thread = threading.Thread(target=process_file, args=(file_path,))
-        threads.append(thread)
-        thread.start()
-    
-    # 等待所有线程完成
-    for thread in threads:
-        thread.join()
+    with open_executor(backend, "Image", workers) as executor:
+        while True:
+            # 在工作者数量和内存上限内提交任务
+            while len(running) < workers:
+                if next_file is None:
+                    file_path = next(pending, None)
+                    if file_path is None:
+                        break
+                    next_file = (file_path, estimate_image_memory(file_path, strip_pixels))
+                file_path, cost = next_file
+                if running and running_memory + cost > memory_limit:
+                    break
+                future = executor.submit(_process_image_task, file_path, output_dir, conversion_function,
+                                         strip_pixels)
+                running[future] = next_file
+                running_memory += cost
+                next_file = None
+            if not running:
+                break
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path, cost = running.pop(future)
+                running_memory -= cost
+                try:
+                    result, messages = future.result()
+                except Exception as e:
+                    result, messages = False, [f"处理 {file_path.name} 时出错: {str(e)}\n"]
+                for message in messages:
+                    log_callback(message)
+                if result:
+                    success_count += 1
     
-    log_callback(f"处理完成，成功转换 {success_count}/{len(file_paths)} 个文件\n")
+    log_callback(f"处理完成，成功转换 {success_count}/{total} 个文件\n")
     log_callback(f"输出目录: {output_dir.absolute()}\n")
     
-    return success_count 
\ No newline at end of file
+    return success_count
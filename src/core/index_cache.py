@@ -0,0 +1,258 @@
+"""
+目录索引模块，以紧凑的二进制格式保存解密时遍历到的文件、文件大小、去除的前缀和原文件哈希，并支持导出为JSON
+"""
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from pathlib import Path
+
+import ujson
+
+from src.utils.file_utils import atomic_output
+
+# 二进制索引文件头: 魔数, 格式版本, 文件数量, 路径数据长度, 前缀数量, 前缀数据长度, 哈希算法名称
+INDEX_MAGIC = b"JCZXIDX\x00"
+INDEX_VERSION = 3
+_HEADER = struct.Struct("<8sIIIII16s")
+
+# 每个原文件哈希的字节数
+HASH_SIZE = 16
+_NO_HASH = bytes(HASH_SIZE)
+
+# 二进制索引文件后缀
+INDEX_SUFFIX = ".idx"
+
+# 文件本次没有被解密时签名偏移未知
+OFFSET_UNKNOWN = 0xFFFFFFFF
+# 文件中没有UnityFS签名，不是资源文件，加密时跳过
+OFFSET_NOT_BUNDLE = 0xFFFFFFFE
+# 没有记录前缀的文件的前缀编号
+PREFIX_NONE = 0xFFFFFFFF
+
+# 路径之间的分隔符，路径中不会出现
+_PATH_SEPARATOR = "\0"
+
+# 一个文件的索引记录，没有记录前缀或原文件哈希时对应字段为None
+IndexEntry = namedtuple("IndexEntry", ["path", "size", "offset", "prefix", "original_hash"])
+
+
+def _to_little_endian(values: array):
+    """数组按小端字节序保存，大端平台上需要转换"""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class IndexCache:
+    """
+    目录索引类
+
+    每个文件只保存一次以"/"分隔的相对路径，大小、签名偏移和前缀编号分别保存在定长数组中。
+    解密时去除的前缀大多相同，只在前缀表中保存一份，文件通过编号引用。
+    原文件（解密前）的快速哈希用于校验加密后能否还原出原文件，未记录时全为0。
+    二进制格式为: 文件头 | 大小(uint64数组) | 签名偏移(uint32数组) | 前缀编号(uint32数组) |
+    前缀长度(uint32数组) | 原文件哈希(每个16字节) | 前缀数据 | 以"\\0"连接的UTF-8路径，
+    读取时只需解析文件头并整体转换各个数组，不逐条解析记录
+    """
+
+    def __init__(self):
+        """初始化空索引"""
+        self.paths = []
+        self.sizes = array("Q")
+        self.offsets = array("I")
+        self.prefix_ids = array("I")
+        self.prefixes = []
+        self._prefix_lookup = {}
+        self.hashes = bytearray()
+        self.hash_algorithm = ""
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def add(self, rel_path, size, offset=OFFSET_UNKNOWN, prefix=None, original_hash=None):
+        """
+        添加文件
+
+        Args:
+            rel_path: 文件相对目标目录的路径
+            size: 文件大小
+            offset: 解密时去除的前缀长度（即UnityFS签名在原文件中的偏移），未知时为OFFSET_UNKNOWN，
+                    不是UnityFS文件时为OFFSET_NOT_BUNDLE
+            prefix: 解密时去除的前缀，设置时offset为前缀长度
+            original_hash: 原文件的十六进制快速哈希，算法为hash_algorithm
+        """
+        self.paths.append(rel_path.replace("\\", "/"))
+        self.sizes.append(size)
+        self.hashes += bytes.fromhex(original_hash) if original_hash else _NO_HASH
+        if prefix is None:
+            self.offsets.append(offset)
+            self.prefix_ids.append(PREFIX_NONE)
+            return
+        prefix_id = self._prefix_lookup.get(prefix)
+        if prefix_id is None:
+            prefix_id = len(self.prefixes)
+            self.prefixes.append(prefix)
+            self._prefix_lookup[prefix] = prefix_id
+        self.offsets.append(len(prefix))
+        self.prefix_ids.append(prefix_id)
+
+    def entries(self):
+        """
+        逐个返回文件记录
+
+        Yields:
+            IndexEntry: 文件记录
+        """
+        prefixes = self.prefixes
+        hashes = self.hashes
+        for i, (rel_path, size, offset, prefix_id) in enumerate(
+                zip(self.paths, self.sizes, self.offsets, self.prefix_ids)):
+            digest = hashes[i * HASH_SIZE:(i + 1) * HASH_SIZE]
+            yield IndexEntry(
+                rel_path, size, offset,
+                None if prefix_id == PREFIX_NONE else prefixes[prefix_id],
+                digest.hex() if digest != _NO_HASH else None,
+            )
+
+    def to_bytes(self):
+        """
+        序列化为二进制格式
+
+        Returns:
+            bytes: 二进制索引数据
+        """
+        blob = _PATH_SEPARATOR.join(self.paths).encode("utf-8")
+        prefix_blob = b"".join(self.prefixes)
+        return b"".join((
+            _HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(self.paths), len(blob),
+                         len(self.prefixes), len(prefix_blob), self.hash_algorithm.encode("ascii")),
+            _to_little_endian(self.sizes),
+            _to_little_endian(self.offsets),
+            _to_little_endian(self.prefix_ids),
+            _to_little_endian(array("I", map(len, self.prefixes))),
+            self.hashes,
+            prefix_blob,
+            blob,
+        ))
+
+    def save(self, cache_file: Path):
+        """
+        以二进制格式保存索引
+
+        Args:
+            cache_file: 索引文件路径
+        """
+        cache_file = Path(cache_file)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_output(cache_file) as f:
+            f.write(self.to_bytes())
+
+    def export_json(self, json_file: Path):
+        """
+        导出为便于阅读的JSON文件，前缀以十六进制字符串保存在前缀表中
+
+        Args:
+            json_file: JSON文件路径
+        """
+        files = {}
+        for entry, prefix_id in zip(self.entries(), self.prefix_ids):
+            files[entry.path] = {
+                "size": entry.size,
+                "offset": None if entry.offset in (OFFSET_UNKNOWN, OFFSET_NOT_BUNDLE) else entry.offset,
+                "bundle": entry.offset != OFFSET_NOT_BUNDLE,
+                "prefix": None if prefix_id == PREFIX_NONE else prefix_id,
+                "hash": entry.original_hash,
+            }
+        with open(json_file, "w", encoding="utf-8") as f:
+            ujson.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "hash_algorithm": self.hash_algorithm,
+                    "prefixes": [prefix.hex() for prefix in self.prefixes],
+                    "files": files,
+                },
+                f, ensure_ascii=False, escape_forward_slashes=False, indent=2
+            )
+
+    @classmethod
+    def load(cls, cache_file: Path):
+        """
+        读取索引文件
+
+        支持二进制索引和旧版本的index_cache_*.json（只有路径）；export_json导出的JSON只用于查看，不能读取
+
+        Args:
+            cache_file: 索引文件路径
+
+        Returns:
+            IndexCache: 索引对象
+
+        Raises:
+            ValueError: 文件格式无法识别
+        """
+        with open(cache_file, "rb") as f:
+            data = f.read()
+        if data.startswith(INDEX_MAGIC):
+            return cls._from_binary(data)
+        return cls._from_json(ujson.loads(data))
+
+    @classmethod
+    def _from_binary(cls, data):
+        if len(data) < _HEADER.size:
+            raise ValueError("索引文件不完整")
+        _, version, count, blob_len, prefix_count, prefix_blob_len, hash_algorithm = _HEADER.unpack_from(data)
+        if version != INDEX_VERSION:
+            raise ValueError(f"不支持的索引格式版本 {version}")
+        pos = _HEADER.size
+        view = memoryview(data)
+
+        def take(typecode, length):
+            nonlocal pos
+            start = pos
+            pos += length * array(typecode).itemsize
+            if pos > len(data):
+                raise ValueError("索引文件不完整")
+            return _from_little_endian(typecode, view[start:pos])
+
+        index = cls()
+        index.sizes = take("Q", count)
+        index.offsets = take("I", count)
+        index.prefix_ids = take("I", count)
+        prefix_lengths = take("I", prefix_count)
+        index.hashes = bytearray(view[pos:pos + count * HASH_SIZE])
+        pos += count * HASH_SIZE
+        index.hash_algorithm = hash_algorithm.rstrip(b"\0").decode("ascii")
+        if len(data) != pos + prefix_blob_len + blob_len or sum(prefix_lengths) != prefix_blob_len:
+            raise ValueError("索引文件不完整")
+
+        for length in prefix_lengths:
+            index.prefixes.append(bytes(view[pos:pos + length]))
+            pos += length
+        index._prefix_lookup = {prefix: prefix_id for prefix_id, prefix in enumerate(index.prefixes)}
+        index.paths = bytes(view[pos:]).decode("utf-8").split(_PATH_SEPARATOR) if count else []
+        if len(index.paths) != count:
+            raise ValueError("索引文件中的路径数量不正确")
+        return index
+
+    @classmethod
+    def _from_json(cls, data):
+        # 旧版本索引每个路径映射到自身，没有大小信息
+        if not isinstance(data, dict) or not all(isinstance(value, str) for value in data.values()):
+            raise ValueError("无法识别的索引文件格式")
+        index = cls()
+        for rel_path in data:
+            index.add(rel_path, 0)
+        return index
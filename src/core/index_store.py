@@ -0,0 +1,266 @@
+"""
+目录索引快照存储模块，按内容哈希保存索引快照，相同的索引只保存一份，并按保留策略清理旧快照
+"""
+import os
+import re
+import time
+from pathlib import Path
+from datetime import datetime
+
+import ujson
+
+from src.core.index_cache import INDEX_SUFFIX, IndexCache
+from src.core.journal import directory_key
+from src.utils.file_utils import atomic_output
+from src.utils.hash_utils import new_hasher
+
+# 缓存目录和快照目录
+CACHE_DIR = Path("cache")
+SNAPSHOT_DIR = CACHE_DIR / "index"
+
+# 快照目录中的目录表文件
+CATALOG_FILE = "catalog.json"
+CATALOG_VERSION = 1
+
+# 每个源目录默认保留的最近运行记录数
+DEFAULT_KEEP_PER_SOURCE = 5
+# 所有快照默认占用的磁盘空间上限
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# 旧版本按时间戳命名的索引文件
+_LEGACY_PATTERN = re.compile(r"^index_cache_(\d{8}_\d{6})\.json$")
+
+
+class IndexStore:
+    """
+    目录索引快照存储类
+
+    快照以内容哈希命名，内容相同的索引只保存一份；目录表记录每次运行的时间、源目录和对应的快照。
+    保留策略: 每个源目录只保留最近keep_per_source次运行的记录，不再被记录引用的快照直接删除；
+    快照总大小超过max_bytes时，按最近使用时间淘汰快照，但每个源目录最新的快照始终保留
+    """
+
+    def __init__(self, snapshot_dir: Path = SNAPSHOT_DIR, keep_per_source=DEFAULT_KEEP_PER_SOURCE,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        """
+        初始化快照存储
+
+        Args:
+            snapshot_dir: 快照目录
+            keep_per_source: 每个源目录保留的最近运行记录数
+            max_bytes: 所有快照占用的磁盘空间上限（字节），None表示不限制
+        """
+        self.snapshot_dir = Path(snapshot_dir)
+        self.catalog_file = self.snapshot_dir / CATALOG_FILE
+        self.keep_per_source = keep_per_source
+        self.max_bytes = max_bytes
+
+    def _load_catalog(self):
+        try:
+            with open(self.catalog_file, "r", encoding="utf-8") as f:
+                data = ujson.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+        if data.get("version") != CATALOG_VERSION:
+            return []
+        return data.get("entries", [])
+
+    def _save_catalog(self, entries):
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        with atomic_output(self.catalog_file) as f:
+            f.write(ujson.dumps(
+                {"version": CATALOG_VERSION, "entries": entries},
+                ensure_ascii=False, escape_forward_slashes=False, indent=2
+            ).encode("utf-8"))
+
+    def snapshot_path(self, snapshot):
+        """
+        获取快照文件路径
+
+        Args:
+            snapshot: 快照名（内容哈希）
+
+        Returns:
+            Path: 快照文件路径
+        """
+        return self.snapshot_dir / f"{snapshot}{INDEX_SUFFIX}"
+
+    def entries(self):
+        """
+        获取所有运行记录，按时间从旧到新排列
+
+        Returns:
+            list: [{"created", "source", "source_key", "snapshot", "size", "last_used"}, ...]
+        """
+        return sorted(self._load_catalog(), key=lambda entry: entry["created"])
+
+    def put(self, index: IndexCache, source_dir, created=None):
+        """
+        保存索引快照并记录本次运行
+
+        Args:
+            index: 目录索引
+            source_dir: 索引对应的源目录，未知时为None
+            created: 运行时间（ISO格式字符串），默认为当前时间
+
+        Returns:
+            tuple: (快照文件路径, 是否复用了已有快照)
+        """
+        data = index.to_bytes()
+        hasher = new_hasher()
+        hasher.update(data)
+        snapshot = hasher.hexdigest()
+        path = self.snapshot_path(snapshot)
+
+        reused = path.exists()
+        if not reused:
+            self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+            with atomic_output(path) as f:
+                f.write(data)
+
+        entries = self._load_catalog()
+        entries.append({
+            "created": created or datetime.now().isoformat(timespec="seconds"),
+            "source": str(source_dir) if source_dir is not None else "",
+            "source_key": directory_key(source_dir) if source_dir is not None else "",
+            "snapshot": snapshot,
+            "size": len(data),
+            "last_used": time.time(),
+        })
+        self._apply_retention(entries)
+        return path, reused
+
+    def latest(self, source_dir):
+        """
+        获取源目录最新的快照
+
+        Args:
+            source_dir: 源目录
+
+        Returns:
+            Path: 快照文件路径，没有记录时返回None
+        """
+        key = directory_key(source_dir)
+        for entry in reversed(self.entries()):
+            if entry["source_key"] == key:
+                return self.snapshot_path(entry["snapshot"])
+        return None
+
+    def touch(self, snapshot_file: Path):
+        """
+        记录快照被使用，用于按最近使用时间淘汰
+
+        Args:
+            snapshot_file: 快照文件路径，不在快照目录中的文件直接忽略
+        """
+        snapshot_file = Path(snapshot_file)
+        try:
+            if snapshot_file.resolve().parent != self.snapshot_dir.resolve():
+                return
+        except OSError:
+            return
+        entries = self._load_catalog()
+        now = time.time()
+        touched = False
+        for entry in entries:
+            if entry["snapshot"] == snapshot_file.stem:
+                entry["last_used"] = now
+                touched = True
+        if touched:
+            self._save_catalog(entries)
+
+    def prune(self):
+        """
+        按保留策略清理快照
+
+        Returns:
+            tuple: (删除的快照数量, 释放的字节数)
+        """
+        return self._apply_retention(self._load_catalog())
+
+    def import_legacy(self, cache_dir: Path = CACHE_DIR):
+        """
+        将旧版本按时间戳命名的index_cache文件导入快照存储并删除原文件
+
+        旧文件没有记录源目录，内容相同的文件导入后只保留一份快照
+
+        Args:
+            cache_dir: 旧索引文件所在目录
+
+        Returns:
+            dict: {旧文件路径: 快照文件路径}
+        """
+        migrated = {}
+        legacy_files = []
+        for file in Path(cache_dir).glob("index_cache_*"):
+            match = _LEGACY_PATTERN.match(file.name)
+            if match and file.is_file():
+                legacy_files.append((match.group(1), file))
+
+        for stamp, file in sorted(legacy_files):
+            try:
+                index = IndexCache.load(file)
+            except (OSError, ValueError):
+                continue
+            created = datetime.strptime(stamp, "%Y%m%d_%H%M%S").isoformat(timespec="seconds")
+            path, _ = self.put(index, None, created)
+            file.unlink()
+            migrated[file] = path
+        return migrated
+
+    def _apply_retention(self, entries):
+        """
+        应用保留策略并保存目录表
+
+        Args:
+            entries: 所有运行记录
+
+        Returns:
+            tuple: (删除的快照数量, 释放的字节数)
+        """
+        # 每个源目录只保留最近的运行记录
+        entries.sort(key=lambda entry: entry["created"])
+        by_source = {}
+        for entry in entries:
+            by_source.setdefault(entry["source_key"], []).append(entry)
+        kept = []
+        for source_entries in by_source.values():
+            kept.extend(source_entries[-self.keep_per_source:] if self.keep_per_source else source_entries)
+
+        # 超出空间上限时按最近使用时间淘汰快照，每个源目录最新的快照不淘汰
+        if self.max_bytes is not None:
+            sizes = {}
+            last_used = {}
+            for entry in kept:
+                sizes[entry["snapshot"]] = entry["size"]
+                last_used[entry["snapshot"]] = max(last_used.get(entry["snapshot"], 0), entry["last_used"])
+            protected = {
+                max(source_entries, key=lambda entry: entry["created"])["snapshot"]
+                for source_entries in by_source.values()
+            }
+            total = sum(sizes.values())
+            for snapshot in sorted(last_used, key=last_used.get):
+                if total <= self.max_bytes:
+                    break
+                if snapshot in protected:
+                    continue
+                total -= sizes[snapshot]
+                kept = [entry for entry in kept if entry["snapshot"] != snapshot]
+
+        kept.sort(key=lambda entry: entry["created"])
+        self._save_catalog(kept)
+
+        # 删除不再被引用的快照文件
+        referenced = {entry["snapshot"] for entry in kept}
+        removed = 0
+        freed = 0
+        for file in self.snapshot_dir.glob(f"*{INDEX_SUFFIX}"):
+            if file.stem not in referenced:
+                try:
+                    size = os.path.getsize(file)
+                    file.unlink()
+                except OSError:
+                    continue
+                removed += 1
+                freed += size
+        return removed, freed
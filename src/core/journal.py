@@ -0,0 +1,291 @@
+"""
+运行日志模块，记录正在改写的文件和已完成的文件，用于中断后的恢复和续跑
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import ujson
+
+# 日志文件目录
+JOURNAL_DIR = Path("cache") / "journal"
+
+
+def directory_key(directory: Path):
+    """根据目录的绝对路径生成日志文件名使用的键"""
+    return hashlib.sha1(str(Path(directory).resolve()).encode("utf-8")).hexdigest()[:16]
+
+
+class _JsonlJournal:
+    """按行追加写入JSON记录的日志文件基类，可在多个线程中同时写入"""
+
+    # 日志类型，用于区分同一目录下的不同日志
+    kind = "journal"
+
+    def __init__(self, journal_file: Path):
+        """
+        初始化日志
+
+        Args:
+            journal_file: 日志文件路径
+        """
+        self.journal_file = Path(journal_file)
+        self._lock = threading.Lock()
+        self._handle = None
+
+    def __getstate__(self):
+        # 传给其他进程时只传日志路径，锁和文件句柄在各进程中重新创建
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_handle"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_directory(cls, directory: Path, *name_parts):
+        """
+        获取目标目录对应的日志
+
+        Args:
+            directory: 目标目录
+            name_parts: 附加在日志文件名中的其他部分
+
+        Returns:
+            日志对象
+        """
+        name = "_".join((cls.kind, *name_parts, directory_key(directory)))
+        return cls(JOURNAL_DIR / f"{name}.jsonl")
+
+    def _records(self):
+        """逐条读取日志记录"""
+        try:
+            with open(self.journal_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield ujson.loads(line)
+                    except ValueError:
+                        # 崩溃时可能留下写了一半的最后一行
+                        continue
+        except FileNotFoundError:
+            return
+
+    def _append(self, record):
+        with self._lock:
+            if self._handle is None:
+                self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+                self._handle = open(self.journal_file, "a", encoding="utf-8")
+            self._handle.write(ujson.dumps(record, ensure_ascii=False) + "\n")
+            self._handle.flush()
+
+    def close(self):
+        """关闭日志文件句柄"""
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def clear(self):
+        """关闭并删除日志文件"""
+        self.close()
+        if self.journal_file.exists():
+            self.journal_file.unlink()
+
+
+class InflightJournal(_JsonlJournal):
+    """
+    进行中文件日志类
+
+    每个目标目录对应一个追加写入的日志文件。改写文件前写入begin记录，
+    替换完成或回滚后写入end记录；只有begin没有end的文件即为被中断的文件。
+    解密时在改写文件前写入prefix记录保存将要去除的前缀，恢复时交给调用方保存。
+    """
+
+    kind = "inflight"
+
+    def recover(self):
+        """
+        处理上次运行中断时留下的文件
+
+        残留的临时文件说明替换尚未发生，原文件完好，删除临时文件即可；
+        没有临时文件时通过大小和修改时间判断替换是否已经完成。
+
+        Returns:
+            dict: {"rolled_back": [...], "completed": [...], "prefixes": {...}}，
+                  前两项为文件路径列表，prefixes为{文件路径: 去除的前缀}
+        """
+        result = {"rolled_back": [], "completed": [], "prefixes": self._prefix_records()}
+        for entry in self._pending_entries():
+            file_path = Path(entry["path"])
+            tmp_path = Path(entry["tmp"])
+            if tmp_path.exists():
+                tmp_path.unlink()
+                result["rolled_back"].append(file_path)
+                continue
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            if st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]:
+                result["rolled_back"].append(file_path)
+            else:
+                result["completed"].append(file_path)
+        self.clear()
+        return result
+
+    def _pending_entries(self):
+        """读取只有begin没有end的记录"""
+        pending = {}
+        for record in self._records():
+            op = record.get("op")
+            if op == "begin":
+                pending[record["path"]] = record
+            elif op == "end":
+                pending.pop(record.get("path"), None)
+        return list(pending.values())
+
+    def _prefix_records(self):
+        """读取prefix记录，同一文件以最后一条为准"""
+        prefixes = {}
+        for record in self._records():
+            if record.get("op") == "prefix":
+                prefixes[Path(record["path"])] = bytes.fromhex(record["prefix"])
+        return prefixes
+
+    def begin(self, file_path: Path, tmp_path: Path):
+        """
+        记录开始改写文件
+
+        Args:
+            file_path: 被改写的文件，可以尚不存在
+            tmp_path: 写入使用的临时文件
+        """
+        # 输出到其他目录时被写入的文件可能还不存在
+        try:
+            st = os.stat(file_path)
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        except FileNotFoundError:
+            size = mtime_ns = None
+        self._append({
+            "op": "begin",
+            "path": str(file_path),
+            "tmp": str(tmp_path),
+            "size": size,
+            "mtime_ns": mtime_ns,
+        })
+
+    def record_prefix(self, file_path: Path, prefix):
+        """
+        记录解密时将要从文件中去除的前缀，在改写文件前调用
+
+        Args:
+            file_path: 被改写的文件
+            prefix: 去除的前缀
+        """
+        self._append({"op": "prefix", "path": str(file_path), "prefix": prefix.hex()})
+
+    def end(self, file_path: Path):
+        """
+        记录文件改写结束（已替换或已回滚）
+
+        Args:
+            file_path: 被改写的文件
+        """
+        self._append({"op": "end", "path": str(file_path)})
+
+
+class ProgressJournal(_JsonlJournal):
+    """
+    运行进度日志类
+
+    记录一次运行中已经处理完的文件及其处理后的大小和修改时间。
+    运行中断后重新运行时，大小和修改时间都没有变化的文件直接跳过。
+    """
+
+    kind = "progress"
+
+    def __init__(self, journal_file: Path):
+        super().__init__(journal_file)
+        self._finished = None
+
+    def load(self):
+        """
+        读取已完成的文件记录
+
+        Returns:
+            int: 已完成的文件数量
+        """
+        self._finished = {}
+        for record in self._records():
+            self._finished[record["path"]] = (record["size"], record["mtime_ns"])
+        return len(self._finished)
+
+    def is_finished(self, rel_path, file_path: Path):
+        """
+        判断文件是否已在之前的运行中处理完成
+
+        Args:
+            rel_path: 文件相对目标目录的路径
+            file_path: 文件路径
+
+        Returns:
+            bool: 文件已完成且之后没有被修改
+        """
+        if not self._finished:
+            return False
+        finished = self._finished.get(rel_path)
+        if finished is None:
+            return False
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return False
+        return finished == (st.st_size, st.st_mtime_ns)
+
+    def mark_finished(self, rel_path, file_path: Path):
+        """
+        记录文件已处理完成
+
+        Args:
+            rel_path: 文件相对目标目录的路径
+            file_path: 文件路径
+        """
+        st = os.stat(file_path)
+        self._append({"path": rel_path, "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+
+
+class PrefixJournal(_JsonlJournal):
+    """
+    前缀日志类
+
+    保存已经从文件中去除、但尚未写入目录索引快照的前缀。前缀只在解密时才能得到，
+    运行被中断时没有写入快照的前缀会丢失，之后这些文件就无法加密还原。
+    保存成功写入快照后删除日志。
+    """
+
+    kind = "prefix"
+
+    def load(self):
+        """
+        读取记录的前缀
+
+        Returns:
+            dict: {文件路径: 去除的前缀}，同一文件以最后一条记录为准
+        """
+        prefixes = {}
+        for record in self._records():
+            prefixes[Path(record["path"])] = bytes.fromhex(record["prefix"])
+        return prefixes
+
+    def record(self, file_path: Path, prefix):
+        """
+        记录文件去除的前缀
+
+        Args:
+            file_path: 文件路径
+            prefix: 去除的前缀
+        """
+        self._append({"path": str(file_path), "prefix": prefix.hex()})
@@ -0,0 +1,161 @@
+"""
+资源文件快速分类模块，只读取文件头部判断文件是否加密，不读取整个文件
+"""
+import time
+from pathlib import Path
+from datetime import datetime
+
+import ujson
+
+from src.core.crypto import PROGRESS_LOG_INTERVAL, scan_unityFS_signatures
+from src.core.executor import BACKEND_THREAD, default_batch_size, executor_workers, iter_batch_results, open_executor
+from src.core.walker import walk_files
+
+# 每个文件读取的字节数，加密前缀和UnityFS文件头都在文件开头
+PROBE_SIZE = 4096
+
+# 文件分类
+CLASS_ENCRYPTED = "encrypted"  # UnityFS签名前有前缀，需要解密
+CLASS_PLAIN = "plain"          # 文件以UnityFS签名开头，无需解密
+CLASS_UNKNOWN = "unknown"      # 文件头部没有UnityFS签名
+CLASSES = (CLASS_ENCRYPTED, CLASS_PLAIN, CLASS_UNKNOWN)
+
+
+def probe_file(file_path: Path, probe_size=PROBE_SIZE):
+    """
+    读取文件头部判断文件类型
+
+    Args:
+        file_path: 文件路径
+        probe_size: 读取的字节数
+
+    Returns:
+        tuple: (文件分类, 加密前缀长度)，未加密时前缀长度为0
+    """
+    with open(file_path, "rb", buffering=0) as f:
+        head = f.read(probe_size)
+    hits = scan_unityFS_signatures(head, max_hits=1)
+    if not hits:
+        return CLASS_UNKNOWN, 0
+    if hits[0] == 0:
+        return CLASS_PLAIN, 0
+    return CLASS_ENCRYPTED, hits[0]
+
+
+def _probe_batch(batch, probe_size):
+    """
+    分类一批文件，供线程池执行
+
+    Args:
+        batch: [(文件路径, 相对路径), ...]
+        probe_size: 每个文件读取的字节数
+
+    Returns:
+        tuple: (每个文件的(文件分类, 前缀长度)或异常对象的列表, 日志消息列表)
+    """
+    results = []
+    for file_path, _ in batch:
+        try:
+            results.append(probe_file(file_path, probe_size))
+        except OSError as e:
+            results.append(e)
+    return results, []
+
+
+def load_probe_manifest(manifest_file):
+    """
+    读取分类清单
+
+    清单中的文件列表可用于只解密加密的文件，如FileFilter(paths=manifest["encrypted"])
+
+    Args:
+        manifest_file: 清单文件路径
+
+    Returns:
+        dict: 清单内容
+    """
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        return ujson.load(f)
+
+
+def probe(game_bundles_path: Path, log_callback=None, manifest_file=None, file_filter=None,
+          probe_size=PROBE_SIZE, max_workers=None, queue_depth=None):
+    """
+    快速分类目录下的所有资源文件
+
+    每个文件只读取开头probe_size个字节，按UnityFS签名的位置分为加密、未加密和未知三类。
+    完整的判断仍以解密时的结果为准
+
+    Args:
+        game_bundles_path: 游戏资源目录
+        log_callback: 日志回调函数
+        manifest_file: 分类清单的保存路径，为None时不保存
+        file_filter: 文件筛选规则（FileFilter），默认处理所有文件
+        probe_size: 每个文件读取的字节数
+        max_workers: 工作者数量，默认使用configure_executors设置的值
+        queue_depth: 同时提交的最大批次数，默认使用configure_executors设置的值
+
+    Returns:
+        dict: {"encrypted": {相对路径: 前缀长度}, "plain": [...], "unknown": [...], "errors": {相对路径: 错误信息}}，
+              目录不存在时返回None
+    """
+    if log_callback is None:
+        log_callback = print
+
+    if not game_bundles_path.exists():
+        log_callback(f"错误: 路径 {game_bundles_path} 不存在\n")
+        return None
+
+    log_callback(f"正在分类目录: {game_bundles_path}\n")
+    start_time = time.time()
+
+    result = {CLASS_ENCRYPTED: {}, CLASS_PLAIN: [], CLASS_UNKNOWN: [], "errors": {}}
+    last_progress_time = time.time()
+    items = walk_files(game_bundles_path, file_filter)
+
+    # 每个文件只读取几KB，主要耗时在打开文件上，使用线程后端
+    with open_executor(BACKEND_THREAD, "Probe", max_workers) as executor:
+        batch_size = default_batch_size(None, executor_workers(executor))
+        batch_results = iter_batch_results(
+            executor, _probe_batch, items, batch_size, (probe_size,), log_callback, queue_depth
+        )
+        for i, (file, outcome) in enumerate(batch_results, 1):
+            rel_path = str(file.relative_to(game_bundles_path))
+            if isinstance(outcome, Exception):
+                result["errors"][rel_path] = str(outcome)
+                log_callback(f"读取 {file.name} 时出错: {str(outcome)}")
+            else:
+                file_class, prefix_len = outcome
+                if file_class == CLASS_ENCRYPTED:
+                    result[CLASS_ENCRYPTED][rel_path] = prefix_len
+                else:
+                    result[file_class].append(rel_path)
+
+            now = time.time()
+            if now - last_progress_time >= PROGRESS_LOG_INTERVAL:
+                log_callback(f"进度: 已分类 {i} 个文件")
+                last_progress_time = now
+
+    if manifest_file is not None:
+        manifest = {
+            "directory": str(game_bundles_path),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "probe_size": probe_size,
+            **result,
+        }
+        try:
+            manifest_file = Path(manifest_file)
+            manifest_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(manifest_file, "w", encoding="utf-8") as f:
+                ujson.dump(manifest, f, ensure_ascii=False, indent=2)
+            log_callback(f"\n分类清单已保存至: {manifest_file}\n")
+        except Exception as e:
+            log_callback(f"\n保存分类清单时出错: {str(e)}\n")
+
+    elapsed = time.time() - start_time
+    log_callback(f"\n分类完成! 耗时: {elapsed:.2f}秒")
+    log_callback(
+        f"加密: {len(result[CLASS_ENCRYPTED])}, 未加密: {len(result[CLASS_PLAIN])}, "
+        f"未知: {len(result[CLASS_UNKNOWN])}, 读取失败: {len(result['errors'])}\n"
+    )
+    return result
@@ -0,0 +1,127 @@
+"""
+往返校验模块，将目录中的文件与解密时记录的原文件哈希比较，检查加密后能否还原出原文件
+"""
+import time
+from pathlib import Path
+
+from src.core.crypto import PROGRESS_LOG_INTERVAL
+from src.core.executor import (
+    BACKEND_AUTO, BACKENDS, default_batch_size, executor_workers, iter_batch_results, open_executor, resolve_backend
+)
+from src.core.index_cache import IndexCache
+from src.utils.hash_utils import HASH_ALGORITHM, file_hash
+
+# 校验结果
+RESULT_MATCHED = "matched"        # 与原文件一致
+RESULT_MISMATCHED = "mismatched"  # 与原文件不一致
+RESULT_MISSING = "missing"        # 文件不存在
+RESULT_UNRECORDED = "unrecorded"  # 索引中没有记录原文件哈希
+
+
+def _verify_batch(batch):
+    """
+    校验一批文件，供线程池或进程池执行
+
+    Args:
+        batch: [(文件路径, 原文件哈希), ...]
+
+    Returns:
+        tuple: (每个文件的校验结果或异常对象的列表, 日志消息列表)
+    """
+    results = []
+    for file_path, original_hash in batch:
+        try:
+            results.append(RESULT_MATCHED if file_hash(file_path) == original_hash else RESULT_MISMATCHED)
+        except FileNotFoundError:
+            results.append(RESULT_MISSING)
+        except OSError as e:
+            # 只影响出错的文件，同一批的其他文件照常校验
+            results.append(e)
+    return results, []
+
+
+def verify(game_bundles_path: Path, cache_file, log_callback=None, file_filter=None, backend=BACKEND_AUTO,
+           batch_size=None, max_workers=None, queue_depth=None):
+    """
+    校验目录下的文件是否与解密时记录的原文件一致
+
+    用于检查加密后的目录能否完整还原出解密前的文件。哈希在工作者中分块计算
+
+    Args:
+        game_bundles_path: 游戏资源目录
+        cache_file: 解密时生成的目录索引
+        log_callback: 日志回调函数
+        file_filter: 文件筛选规则（FileFilter），默认校验索引中的所有文件
+        backend: 执行后端，BACKENDS之一
+        batch_size: 每批提交的文件数量，默认根据文件数量和工作者数量计算
+        max_workers: 工作者数量，默认使用configure_executors设置的值
+        queue_depth: 同时提交的最大批次数，默认使用configure_executors设置的值
+
+    Returns:
+        dict: {RESULT_*: [相对路径, ...]}，无法校验时返回None
+    """
+    if log_callback is None:
+        log_callback = print
+
+    if backend not in BACKENDS:
+        log_callback(f"错误: 不支持的执行后端 {backend}\n")
+        return None
+
+    if not game_bundles_path.exists():
+        log_callback(f"错误: 路径 {game_bundles_path} 不存在\n")
+        return None
+
+    try:
+        index = IndexCache.load(cache_file)
+    except Exception as e:
+        log_callback(f"加载index_cache文件时出错: {str(e)}\n")
+        return None
+    if index.hash_algorithm != HASH_ALGORITHM:
+        log_callback(f"索引中的原文件哈希算法为 {index.hash_algorithm or '无'}，当前为 {HASH_ALGORITHM}，无法校验\n")
+        return None
+
+    log_callback(f"正在校验目录: {game_bundles_path}\n")
+    start_time = time.time()
+
+    result = {RESULT_MATCHED: [], RESULT_MISMATCHED: [], RESULT_MISSING: [], RESULT_UNRECORDED: []}
+    items = []
+    for entry in index.entries():
+        if file_filter is not None and not file_filter.match_path(entry.path.rsplit("/", 1)[-1], entry.path):
+            continue
+        if entry.original_hash is None:
+            result[RESULT_UNRECORDED].append(entry.path)
+            continue
+        items.append((game_bundles_path / entry.path, entry.original_hash))
+
+    total = len(items)
+    last_progress = 0
+    last_progress_time = time.time()
+    backend = resolve_backend(backend, total)
+
+    with open_executor(backend, "Verify", max_workers) as executor:
+        batch_size = batch_size or default_batch_size(total, executor_workers(executor))
+        batch_results = iter_batch_results(executor, _verify_batch, items, batch_size, (), log_callback, queue_depth)
+
+        for i, (file, outcome) in enumerate(batch_results, 1):
+            rel_path = file.relative_to(game_bundles_path).as_posix()
+            if isinstance(outcome, Exception):
+                log_callback(f"校验 {file.name} 时出错: {str(outcome)}")
+                outcome = RESULT_MISMATCHED
+            result[outcome].append(rel_path)
+            if outcome == RESULT_MISMATCHED:
+                log_callback(f"校验不一致: {rel_path}")
+
+            progress = int(i / total * 100)
+            now = time.time()
+            if progress >= last_progress + 10 or i == total or now - last_progress_time >= PROGRESS_LOG_INTERVAL:
+                log_callback(f"进度: {progress}% ({i}/{total})")
+                last_progress = progress
+                last_progress_time = now
+
+    elapsed = time.time() - start_time
+    log_callback(f"\n校验完成! 耗时: {elapsed:.2f}秒")
+    log_callback(
+        f"一致: {len(result[RESULT_MATCHED])}, 不一致: {len(result[RESULT_MISMATCHED])}, "
+        f"缺失: {len(result[RESULT_MISSING])}, 未记录哈希: {len(result[RESULT_UNRECORDED])}\n"
+    )
+    return result
@@ -0,0 +1,74 @@
+"""
+目录遍历模块，基于os.scandir逐个产出文件，边遍历边过滤
+"""
+import os
+from pathlib import Path
+
+from src.core.file_filter import FileFilter
+from src.utils.file_utils import TEMP_SUFFIX, link_file
+
+# 默认筛选规则：只排除不需要解密的文件后缀
+DEFAULT_FILTER = FileFilter()
+
+# 不排除任何文件的筛选规则
+ALL_FILES_FILTER = FileFilter(exclude_suffixes=())
+
+
+def walk_files(root: Path, file_filter=None):
+    """
+    遍历目录下的所有文件
+
+    直接使用scandir返回的目录项类型信息判断文件和目录，不为每个目录项额外调用stat；
+    筛选规则在遍历时应用，只有设置了大小范围时才读取文件大小。
+    不进入符号链接指向的目录，避免循环。
+
+    Args:
+        root: 根目录
+        file_filter: 文件筛选规则，默认排除EXCLUDED_SUFFIXES中的后缀
+
+    Yields:
+        tuple: (文件路径, 相对根目录的路径)
+    """
+    file_filter = file_filter or DEFAULT_FILTER
+    needs_size = file_filter.needs_size
+    pending_dirs = [(os.fspath(root), "")]
+    while pending_dirs:
+        directory, rel_dir = pending_dirs.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    rel_path = rel_dir + entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        pending_dirs.append((entry.path, rel_path + os.sep))
+                    elif entry.is_file():
+                        if entry.name.endswith(TEMP_SUFFIX) or not file_filter.match_path(entry.name, rel_path):
+                            continue
+                        if needs_size and not file_filter.match_size(entry.stat().st_size):
+                            continue
+                        yield Path(entry.path), rel_path
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            # 根目录是文件时与空目录相同，没有需要处理的文件
+            continue
+
+
+def mirror_tree(root: Path, output_root: Path, skip=()):
+    """
+    将目录下的文件以reflink/硬链接（不支持时复制）的方式放到输出目录的相同相对位置
+
+    用于输出到其他目录时补全不需要处理的文件，使输出目录与原目录结构一致
+
+    Args:
+        root: 原目录
+        output_root: 输出目录
+        skip: 已经处理过、不需要链接的相对路径集合
+
+    Returns:
+        dict: {链接方式: 文件数量}
+    """
+    counts = {}
+    for file, rel_path in walk_files(root, ALL_FILES_FILTER):
+        if rel_path in skip:
+            continue
+        method = link_file(file, Path(output_root) / rel_path)
+        counts[method] = counts.get(method, 0) + 1
+    return counts
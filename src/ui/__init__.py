@@ -1,8 +1,28 @@
 """
 UI模块包 - PyQt6版本
+
+标签页类在第一次访问时才导入对应模块
 """
-from .crypto_tab import CryptoTab
-from .image_tab import ImageTab
-from .settings_tab import SettingsTab
+import importlib
+
+# 导出名称: 所在模块
+_EXPORTS = {
+    'CryptoTab': '.crypto_tab',
+    'ImageTab': '.image_tab',
+    'SettingsTab': '.settings_tab',
+}
+
+__all__ = ['CryptoTab', 'ImageTab', 'SettingsTab']
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = ['CryptoTab', 'ImageTab', 'SettingsTab'] 
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
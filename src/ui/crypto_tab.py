@@ -16,6 +16,7 @@ from qfluentwidgets import (
 
 from src.config import ConfigManager
 from src.core.crypto import decrypt, encode
+from src.core.index_store import SNAPSHOT_DIR
 
 
 class CryptoTab(QWidget):
@@ -243,12 +244,12 @@ class CryptoTab(QWidget):
 
     def select_cache_file(self):
         """选择index_cache文件"""
-        cache_dir = str(Path("cache").absolute()) if Path("cache").exists() else None
+        cache_dir = next((str(d.absolute()) for d in (SNAPSHOT_DIR, Path("cache")) if d.exists()), None)
         file, _ = QFileDialog.getOpenFileName(
             self, 
             "选择index_cache文件",
             cache_dir,
-            "JSON文件 (*.json);;所有文件 (*)"
+            "索引文件 (*.idx *.json);;所有文件 (*)"
         )
         if file:
             self.cache_entry.setText(file)
@@ -294,12 +295,16 @@ class CryptoTab(QWidget):
             process_func: 处理函数（decrypt或encode）
             directory: 处理目录
         """
+        concurrency = {
+            'max_workers': self.config.get('crypto_workers') or None,
+            'queue_depth': self.config.get('crypto_queue_depth') or None
+        }
         try:
             if process_func == decrypt:
-                process_func(Path(directory), self.log)
+                process_func(Path(directory), self.log, **concurrency)
             else:  # encode
                 cache_file = self.cache_entry.text()
-                process_func(Path(directory), cache_file, self.log)
+                process_func(Path(directory), cache_file, self.log, **concurrency)
         except Exception as e:
             self.log(f"错误: {str(e)}\n")
         finally:
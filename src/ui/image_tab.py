@@ -16,7 +16,6 @@ from qfluentwidgets import (
 )
 
 from src.config import ConfigManager
-from src.core.image_processor import premultiply_alpha, straight_alpha, batch_process_images
 
 
 class ImageTab(QWidget):
@@ -245,8 +244,6 @@ class ImageTab(QWidget):
         file_paths = [Path(f) for f in files]
         self.last_processed_images = file_paths
         
-        # 选择转换函数
-        conversion_function = straight_alpha if premultiplied_to_straight else premultiply_alpha
         conversion_type = "预乘转直通" if premultiplied_to_straight else "直通转预乘"
         
         # 显示处理信息
@@ -256,20 +253,25 @@ class ImageTab(QWidget):
         # 在新线程中处理图像
         thread = threading.Thread(
             target=self.process_images,
-            args=(file_paths, conversion_function)
+            args=(file_paths, premultiplied_to_straight)
         )
         thread.daemon = True
         thread.start()
 
-    def process_images(self, file_paths, conversion_function):
+    def process_images(self, file_paths, premultiplied_to_straight):
         """
         处理图像文件
         
         Args:
             file_paths: 图像文件路径列表
-            conversion_function: 转换函数
+            premultiplied_to_straight: 是否从预乘透明转换为直通透明
         """
         try:
+            # 图像处理依赖PIL和numpy，第一次处理图像时才导入，加快程序启动
+            from src.core.image_processor import batch_process_images, premultiply_alpha, straight_alpha
+            
+            # 选择转换函数
+            conversion_function = straight_alpha if premultiplied_to_straight else premultiply_alpha
             batch_process_images(file_paths, conversion_function, self.log)
             
             # 完成后显示成功信息
@@ -2,7 +2,6 @@
 设置标签页UI模块 - PyQt6版本
 """
 import os
-import shutil
 import webbrowser
 from pathlib import Path
 
@@ -15,6 +14,7 @@ from qfluentwidgets import (
 )
 
 from src.config import ConfigManager
+from src.core.index_store import IndexStore
 
 
 class SettingsTab(QWidget):
@@ -118,9 +118,9 @@ class SettingsTab(QWidget):
         # 清除缓存
         self.clear_cache_card = PrimaryPushSettingCard(
             icon=FluentIcon.DELETE,
-            title="清除缓存文件",
-            content="删除所有缓存文件以释放磁盘空间",
-            text="清除",
+            title="清理缓存文件",
+            content="每个目录只保留最近的索引快照，超出空间上限时删除最久未使用的快照",
+            text="清理",
             parent=files_group
         )
         self.clear_cache_card.button.clicked.connect(self.clear_cache)
@@ -211,24 +211,21 @@ class SettingsTab(QWidget):
         )
 
     def clear_cache(self):
-        """清除缓存文件"""
+        """按保留策略清理缓存的目录索引快照"""
         cache_dir = Path("cache")
         if cache_dir.exists():
             try:
-                # 删除缓存目录中的所有文件
-                files_removed = 0
-                for file in cache_dir.glob("*"):
-                    if file.is_file():
-                        file.unlink()
-                        files_removed += 1
-                    elif file.is_dir():
-                        shutil.rmtree(file)
-                        files_removed += 1
+                store = IndexStore()
+                # 旧版本的index_cache文件先导入快照存储，内容相同的只保留一份
+                migrated = store.import_legacy(cache_dir)
+                removed, freed = store.prune()
+                self.update_migrated_cache_file(migrated)
 
                 # 显示成功消息
                 InfoBar.success(
                     title="成功",
-                    content=f"缓存文件已清除，共删除 {files_removed} 个文件",
+                    content=f"缓存已清理，导入旧索引 {len(migrated)} 个，"
+                            f"删除快照 {removed} 个，释放 {freed / 1024:.1f} KB",
                     orient=Qt.Orientation.Horizontal,
                     position=InfoBarPosition.TOP_RIGHT,
                     duration=2000,
@@ -238,7 +235,7 @@ class SettingsTab(QWidget):
                 # 显示错误消息
                 InfoBar.error(
                     title="错误",
-                    content=f"清除缓存时出错: {str(e)}",
+                    content=f"清理缓存时出错: {str(e)}",
                     orient=Qt.Orientation.Horizontal,
                     position=InfoBarPosition.TOP_RIGHT,
                     duration=5000,
@@ -254,6 +251,29 @@ class SettingsTab(QWidget):
                 duration=2000,
                 parent=self
             )
+
+    def update_migrated_cache_file(self, migrated):
+        """
+        已选择的index_cache文件被导入快照存储后，改为选择对应的快照
+
+        Args:
+            migrated: {旧文件路径: 快照文件路径}
+        """
+        cache_file = self.config.get('cache_file', '')
+        if not cache_file:
+            return
+        for old_file, snapshot in migrated.items():
+            if Path(cache_file).absolute() == old_file.absolute():
+                self.config['cache_file'] = str(snapshot.absolute())
+                try:
+                    from src.ui import CryptoTab
+                    crypto_tab = self.parent.findChild(CryptoTab)
+                    if crypto_tab:
+                        crypto_tab.cache_entry.setText(self.config['cache_file'])
+                except Exception:
+                    pass
+                ConfigManager.save_config(self.config)
+                return
     
     def open_directory(self, directory):
         """打开指定目录"""
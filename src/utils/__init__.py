@@ -1,3 +1,10 @@
 """
 工具函数包
-""" 
\ No newline at end of file
+"""
+from .file_utils import atomic_output, temp_path_for, fsync_directory, link_file
+from .hash_utils import file_hash, file_hashes, new_hasher, HASH_ALGORITHM
+
+__all__ = [
+    'atomic_output', 'temp_path_for', 'fsync_directory', 'link_file',
+    'file_hash', 'file_hashes', 'new_hasher', 'HASH_ALGORITHM'
+]
@@ -0,0 +1,154 @@
+"""
+文件操作工具模块
+"""
+import errno
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows上没有fcntl，不支持reflink
+    fcntl = None
+
+# 临时文件后缀，写入完成后原子替换目标文件
+TEMP_SUFFIX = ".jczx.tmp"
+
+# Linux上克隆文件数据块（reflink）的ioctl请求号，btrfs/xfs等写时复制文件系统支持
+_FICLONE = 0x40049409
+
+# 不支持reflink或硬链接时返回的错误码，遇到这些错误时换用下一种方式
+_LINK_UNSUPPORTED = {
+    errno.EXDEV, errno.EPERM, errno.EACCES, errno.EMLINK, errno.EINVAL, errno.ENOTTY,
+    errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOSYS, errno.EBADF
+}
+
+
+def temp_path_for(file_path: Path):
+    """
+    获取文件对应的同目录临时文件路径
+    
+    临时文件名是确定的，崩溃后无需日志也能找到残留的临时文件
+    
+    Args:
+        file_path: 目标文件路径
+        
+    Returns:
+        Path: 临时文件路径
+    """
+    return file_path.with_name(f".{file_path.name}{TEMP_SUFFIX}")
+
+
+def fsync_directory(directory: Path):
+    """
+    将目录项的修改（如重命名）刷新到磁盘，Windows上不支持打开目录，直接跳过
+    
+    Args:
+        directory: 目录路径
+    """
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_output(file_path: Path, journal=None, mode_source: Path = None):
+    """
+    原子地替换文件内容
+    
+    先写入同目录临时文件，fsync后重命名覆盖目标文件；中途出错或进程被杀死时目标文件保持不变。
+    目标文件不存在时直接创建。目标文件是硬链接时只替换目录项，不会改动链接的另一端
+    
+    Args:
+        file_path: 目标文件路径
+        journal: 可选的进行中文件日志，需提供begin/end方法
+        mode_source: 复制权限位的来源文件，默认为目标文件本身
+        
+    Yields:
+        file: 以二进制写模式打开的临时文件对象
+    """
+    tmp_path = temp_path_for(file_path)
+    mode_source = mode_source or file_path
+    if journal is not None:
+        journal.begin(file_path, tmp_path)
+    try:
+        with open(tmp_path, "wb") as out:
+            yield out
+            out.flush()
+            os.fsync(out.fileno())
+        if mode_source.exists():
+            shutil.copymode(mode_source, tmp_path)
+        os.replace(tmp_path, file_path)
+        fsync_directory(file_path.parent)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+    finally:
+        if journal is not None:
+            journal.end(file_path)
+
+
+def _reflink(src_path: Path, dst_path: Path):
+    """通过FICLONE克隆文件数据块，新文件与源文件共享数据但修改时互不影响"""
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+
+
+def link_file(src_path: Path, dst_path: Path):
+    """
+    以尽量少的I/O在dst_path生成与src_path内容相同的文件，用于输出目录中不需要修改的文件
+
+    依次尝试reflink（写时复制，不共享后续修改）、硬链接（与源文件共享同一份数据）和普通复制；
+    先生成同目录临时文件再原子替换目标文件，目标文件已经是源文件的硬链接时不做任何操作
+
+    Args:
+        src_path: 源文件路径
+        dst_path: 目标文件路径
+
+    Returns:
+        str: 使用的方式，"reflink"、"hardlink"、"copy"或"exists"
+    """
+    try:
+        if os.path.samefile(src_path, dst_path):
+            return "exists"
+    except OSError:
+        pass
+
+    dst_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path_for(dst_path)
+    if tmp_path.exists():
+        tmp_path.unlink()
+    try:
+        method = None
+        if fcntl is not None and sys.platform.startswith("linux"):
+            try:
+                _reflink(src_path, tmp_path)
+                shutil.copystat(src_path, tmp_path)
+                method = "reflink"
+            except OSError as e:
+                if e.errno not in _LINK_UNSUPPORTED:
+                    raise
+                tmp_path.unlink()
+        if method is None:
+            try:
+                os.link(src_path, tmp_path)
+                method = "hardlink"
+            except OSError as e:
+                if e.errno not in _LINK_UNSUPPORTED:
+                    raise
+        if method is None:
+            shutil.copy2(src_path, tmp_path)
+            method = "copy"
+        os.replace(tmp_path, dst_path)
+        return method
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
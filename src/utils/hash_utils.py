@@ -0,0 +1,67 @@
+"""
+快速文件哈希工具模块
+"""
+import hashlib
+
+try:
+    import xxhash
+except ImportError:  # xxhash为可选依赖，未安装时使用标准库的blake2b
+    xxhash = None
+
+# 分块读取文件的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 当前使用的哈希算法名称，保存在索引中，算法变化时旧的哈希值不再可比
+HASH_ALGORITHM = "xxh3_128" if xxhash is not None else "blake2b_128"
+
+
+def new_hasher():
+    """
+    创建一个非加密用途的快速哈希对象
+
+    Returns:
+        哈希对象，提供update/hexdigest方法
+    """
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def file_hash(file_path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    分块计算文件内容的快速哈希
+
+    Args:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    return file_hashes(file_path, (b"",), chunk_size)[0]
+
+
+def file_hashes(file_path, prefixes, chunk_size=HASH_CHUNK_SIZE):
+    """
+    只读取一遍文件，分别计算在文件内容前加上各个前缀后的快速哈希
+
+    用于同时得到解密后文件和解密前原文件（前缀+解密后内容）的哈希
+
+    Args:
+        file_path: 文件路径
+        prefixes: 前缀列表
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        list: 每个前缀对应的十六进制哈希值
+    """
+    hashers = []
+    for prefix in prefixes:
+        hasher = new_hasher()
+        hasher.update(prefix)
+        hashers.append(hasher)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            for hasher in hashers:
+                hasher.update(chunk)
+    return [hasher.hexdigest() for hasher in hashers]
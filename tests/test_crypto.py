@@ -0,0 +1,271 @@
+"""
+解密/加密流程测试：签名扫描、目录索引格式、往返还原、中断后续跑、文件筛选和输出到其他目录
+"""
+import io
+import os
+import re
+import subprocess
+import sys
+import textwrap
+from binascii import hexlify
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.core.crypto import (
+    IO_MODES, UNITYFS_SIGNATURE, decrypt, encode, find_next_unityFS_index, find_unityFS_index_in_stream
+)
+from src.core.executor import BACKEND_PROCESS, BACKEND_THREAD
+from src.core.file_filter import FileFilter
+from src.core.index_cache import OFFSET_NOT_BUNDLE, IndexCache
+from src.core.index_store import IndexStore
+from src.core.verify import RESULT_MATCHED, RESULT_MISMATCHED, verify
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# 签名及其后的版本号字节
+SIGNATURE = UNITYFS_SIGNATURE + b"\x07"
+
+
+def reference_index(file_data):
+    """原来的hexlify+正则查找，返回第一个签名的字节偏移"""
+    open_file_hex = hexlify(file_data)
+    if len(re.findall(b"556e6974794653000000000", open_file_hex)) < 2:
+        return -1
+    return open_file_hex.find(b"556e6974794653000000000") // 2
+
+
+def make_bundle(rng, prefix_len):
+    """生成一个资源文件：前缀 + 两个UnityFS签名之间的随机内容"""
+    return (rng.bytes(prefix_len) + SIGNATURE + rng.bytes(int(rng.integers(100, 3000)))
+            + SIGNATURE + rng.bytes(50))
+
+
+def make_tree(root, count=8):
+    """
+    生成测试目录，包含子目录中的资源文件、本来就没有前缀的资源文件和不是资源文件的文件
+
+    Returns:
+        dict: {以"/"分隔的相对路径: 文件内容}
+    """
+    rng = np.random.default_rng(count)
+    files = {}
+    for i in range(count):
+        files[f"{'sub0/' if i % 2 else ''}bundle_{i}.ab"] = make_bundle(rng, 16 + i)
+    files["plain.ab"] = make_bundle(rng, 0)
+    files["notes.bin"] = rng.bytes(300)
+    for rel_path, data in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return files
+
+
+def read_tree(root, files):
+    return {rel_path: (root / rel_path).read_bytes() for rel_path in files}
+
+
+def quiet(message):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def work_dir(tmp_path, monkeypatch):
+    """缓存和日志写在当前目录的cache下，每个测试使用单独的目录"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def run_interrupted(operation, directory, stop_after, **options):
+    """
+    在子进程中运行解密或加密，在第stop_after个文件替换完成、写入end记录前结束进程，模拟运行被强制中断
+    """
+    code = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {str(ROOT)!r})
+        from pathlib import Path
+        from src.core import crypto
+        from src.core.index_store import IndexStore
+        from src.core.journal import InflightJournal
+        count = [0]
+        def end(self, file_path):
+            count[0] += 1
+            if count[0] == {stop_after}:
+                os._exit(9)
+        InflightJournal.end = end
+        directory = Path({str(directory)!r})
+        options = {options!r}
+        if {operation!r} == "decrypt":
+            crypto.decrypt(directory, lambda message: None, **options)
+        else:
+            crypto.encode(directory, IndexStore().latest(directory), lambda message: None, **options)
+    """)
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.getcwd())
+    assert result.returncode == 9
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_scanner_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    signatures = int(rng.integers(0, 4))
+    parts = [rng.bytes(int(rng.integers(0, 200)))]
+    for _ in range(signatures):
+        # 版本号字节高4位不为0时不是有效签名
+        version = int(rng.integers(0, 32))
+        parts.append(UNITYFS_SIGNATURE + bytes([version]) + rng.bytes(int(rng.integers(0, 200))))
+    data = b"".join(parts)
+    expected = reference_index(data)
+    assert find_next_unityFS_index(data) == expected
+    for chunk_size in (1, 7, 64, 1024):
+        assert find_unityFS_index_in_stream(io.BytesIO(data), chunk_size) == expected
+
+
+def test_index_round_trip(work_dir):
+    index = IndexCache()
+    index.hash_algorithm = "blake2b_128"
+    index.add("sub0/a.ab", 1000, prefix=b"\x01\x02\x03", original_hash="ab" * 16)
+    index.add("sub0/b.ab", 2000, prefix=b"\x01\x02\x03")
+    index.add("plain.ab", 30)
+    index.add("notes.bin", 40, OFFSET_NOT_BUNDLE)
+    index.add("文件.ab", 50, prefix=b"\x04" * 20, original_hash="cd" * 16)
+    index.save(work_dir / "index.idx")
+
+    loaded = IndexCache.load(work_dir / "index.idx")
+    assert list(loaded.entries()) == list(index.entries())
+    assert loaded.hash_algorithm == "blake2b_128"
+    assert loaded.to_bytes() == index.to_bytes()
+
+
+def test_index_rejects_truncated_files(work_dir):
+    index = IndexCache()
+    for i in range(10):
+        index.add(f"bundle_{i}.ab", i, prefix=bytes([i]) * 5)
+    data = index.to_bytes()
+    for length in (4, 40, len(data) // 2, len(data) - 1):
+        (work_dir / "index.idx").write_bytes(data[:length])
+        with pytest.raises(ValueError):
+            IndexCache.load(work_dir / "index.idx")
+
+
+def test_index_reads_legacy_json(work_dir):
+    (work_dir / "index_cache_20240101_000000.json").write_text('{"a/b.ab": "a/b.ab"}', encoding="utf-8")
+    entries = list(IndexCache.load(work_dir / "index_cache_20240101_000000.json").entries())
+    assert [(entry.path, entry.prefix) for entry in entries] == [("a/b.ab", None)]
+
+
+@pytest.mark.parametrize("backend", (BACKEND_THREAD, BACKEND_PROCESS))
+@pytest.mark.parametrize("mode", IO_MODES)
+def test_round_trip(work_dir, mode, backend):
+    root = work_dir / "bundles"
+    files = make_tree(root)
+
+    stats = decrypt(root, quiet, mode=mode, backend=backend)
+    assert stats["failed"] == 0
+    for rel_path, data in read_tree(root, files).items():
+        if rel_path != "notes.bin":
+            assert data.startswith(SIGNATURE)
+
+    stats = encode(root, IndexStore().latest(root), quiet, mode=mode, backend=backend, verify=True)
+    assert stats["failed"] == 0 and stats["mismatched"] == 0
+    assert read_tree(root, files) == files
+
+
+def test_resume_after_interrupted_decrypt(work_dir):
+    root = work_dir / "bundles"
+    files = make_tree(root)
+    run_interrupted("decrypt", root, 3, backend=BACKEND_THREAD, max_workers=1)
+
+    log = []
+    stats = decrypt(root, log.append, backend=BACKEND_THREAD)
+    assert stats["failed"] == 0
+    assert stats["resumed"] > 0
+
+    encode(root, IndexStore().latest(root), quiet)
+    assert read_tree(root, files) == files
+
+
+def test_resume_after_interrupted_encode(work_dir):
+    root = work_dir / "bundles"
+    files = make_tree(root)
+    decrypt(root, quiet)
+    run_interrupted("encode", root, 3, backend=BACKEND_THREAD, max_workers=1)
+
+    stats = encode(root, IndexStore().latest(root), quiet, backend=BACKEND_THREAD)
+    assert stats["failed"] == 0
+    assert stats["resumed"] > 0
+    assert read_tree(root, files) == files
+
+
+def test_decrypt_after_interrupted_encode(work_dir):
+    root = work_dir / "bundles"
+    files = make_tree(root)
+    decrypt(root, quiet)
+    decrypted = read_tree(root, files)
+    run_interrupted("encode", root, 3, backend=BACKEND_THREAD, max_workers=1)
+
+    # 加密中断时替换完成的文件不能被解密当作已完成跳过
+    stats = decrypt(root, quiet)
+    assert stats["resumed"] == 0
+    assert read_tree(root, files) == decrypted
+
+
+def test_filter_globs_are_anchored():
+    include = FileFilter(include=["sub0/*"])
+    assert include.match_path("a.ab", "sub0/a.ab")
+    assert not include.match_path("a.ab", "xsub0/a.ab")
+    assert not include.match_path("a.ab", "deep/sub0/a.ab")
+
+    exclude = FileFilter(exclude=["prefabs/*.bundle"])
+    assert not exclude.match_path("x.bundle", "prefabs/x.bundle")
+    assert exclude.match_path("x.bundle", "old_prefabs/x.bundle")
+
+    # 不含"/"的glob匹配任意目录下的文件名，正则表达式可以只匹配路径的一部分
+    assert FileFilter(include=["bundle_*"]).match_path("bundle_1.ab", "deep/bundle_1.ab")
+    assert FileFilter(include=["re:sub0/"]).match_path("a.ab", "deep/sub0/a.ab")
+
+
+def test_filtered_decrypt_keeps_other_prefixes(work_dir):
+    root = work_dir / "bundles"
+    files = make_tree(root)
+    decrypt(root, quiet)
+    stats = decrypt(root, quiet, file_filter=FileFilter(include=["sub0/*"]))
+    assert stats["failed"] == 0
+
+    encode(root, IndexStore().latest(root), quiet)
+    assert read_tree(root, files) == files
+
+
+def test_out_of_place_round_trip(work_dir):
+    root = work_dir / "bundles"
+    output = work_dir / "decrypted"
+    files = make_tree(root)
+
+    decrypt(root, quiet, output_dir=output)
+    assert read_tree(root, files) == files
+    # 快照描述输出目录，按输出目录即可找到
+    snapshot = IndexStore().latest(output)
+    assert snapshot is not None
+
+    encode(output, snapshot, quiet, verify=True)
+    assert read_tree(output, files) == files
+
+
+def test_verify_reports_unreadable_file_only(work_dir):
+    root = work_dir / "bundles"
+    make_tree(root)
+    decrypt(root, quiet)
+    snapshot = IndexStore().latest(root)
+    encode(root, snapshot, quiet)
+
+    (root / "bundle_0.ab").unlink()
+    (root / "bundle_0.ab").mkdir()
+    result = verify(root, snapshot, quiet, backend=BACKEND_THREAD, batch_size=100)
+    assert result[RESULT_MISMATCHED] == ["bundle_0.ab"]
+    assert len(result[RESULT_MATCHED]) == 7
+
+
+def test_decrypt_file_path_finds_nothing(work_dir):
+    (work_dir / "bundle.ab").write_bytes(b"data")
+    stats = decrypt(work_dir / "bundle.ab", quiet)
+    assert stats["successful"] == 0 and stats["failed"] == 0
@@ -0,0 +1,79 @@
+"""
+图像透明度转换的一致性测试，各计算方式的结果必须与原来的逐像素循环完全相同
+"""
+import numpy as np
+import pytest
+
+from src.core.image_processor import KERNEL_ARITHMETIC, KERNEL_LUT, premultiply_pixels, straighten_pixels
+
+KERNELS = (KERNEL_ARITHMETIC, KERNEL_LUT)
+
+
+def reference_premultiply(matrix):
+    """原来的直通透明转预乘透明循环"""
+    matrix = matrix.astype(int)
+    for row in matrix:
+        for pixel in row:
+            if pixel[3] == 255:
+                continue
+            elif pixel[3] == 0:
+                pixel[0] = pixel[1] = pixel[2] = 0
+            else:
+                for i in range(3):
+                    pixel[i] = pixel[i] * pixel[3] // 255
+    return matrix.astype(np.uint8)
+
+
+def reference_straighten(matrix):
+    """原来的预乘透明转直通透明循环，颜色通道按Python整数计算（与NumPy 1.x的标量运算一致）"""
+    matrix = matrix.copy()
+    for row in matrix:
+        for pixel in row:
+            rgb = [int(c) for c in pixel[:-1]]
+            alpha = int(pixel[-1])
+            if alpha != 0 and alpha != 255:
+                maxrgb = max(rgb)
+                if maxrgb > alpha:
+                    for i in range(3):
+                        pixel[i] = rgb[i] * 255 // maxrgb
+                else:
+                    for i in range(3):
+                        pixel[i] = rgb[i] * 255 // alpha
+    return matrix
+
+
+def random_images():
+    rng = np.random.default_rng(20240601)
+    yield rng.integers(0, 256, (37, 53, 4), dtype=np.uint8)
+    # alpha集中在边界值附近
+    matrix = rng.integers(0, 256, (41, 29, 4), dtype=np.uint8)
+    matrix[..., 3] = rng.choice(np.array([0, 1, 2, 127, 128, 253, 254, 255], dtype=np.uint8), (41, 29))
+    yield matrix
+    # 预乘后的图像，颜色通道不超过alpha
+    matrix = rng.integers(0, 256, (32, 32, 4), dtype=np.uint8)
+    matrix[..., :3] = matrix[..., :3].astype(int) * matrix[..., 3:].astype(int) // 255
+    yield matrix
+
+
+def all_pairs_images():
+    """每个(颜色, alpha)组合各出现一次，分别作为最大和非最大的颜色通道"""
+    channel, alpha = np.meshgrid(np.arange(256), np.arange(256))
+    yield np.stack([channel, channel // 2, np.zeros_like(channel), alpha], -1).astype(np.uint8)
+    yield np.stack([channel, (channel * 7) % 256, 255 - channel, alpha], -1).astype(np.uint8)
+
+
+IMAGES = list(random_images()) + list(all_pairs_images())
+
+
+@pytest.mark.parametrize("kernel", KERNELS)
+@pytest.mark.parametrize("matrix", IMAGES, ids=range(len(IMAGES)))
+def test_premultiply_matches_reference(kernel, matrix):
+    expected = reference_premultiply(matrix)
+    assert np.array_equal(premultiply_pixels(matrix.copy(), kernel), expected)
+
+
+@pytest.mark.parametrize("kernel", KERNELS)
+@pytest.mark.parametrize("matrix", IMAGES, ids=range(len(IMAGES)))
+def test_straighten_matches_reference(kernel, matrix):
+    expected = reference_straighten(matrix)
+    assert np.array_equal(straighten_pixels(matrix.copy(), kernel), expected)
@@ -0,0 +1,40 @@
+"""
+导入开销测试，命令行和核心功能不能加载图形界面和图像处理依赖
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# 在新进程中导入时的耗时上限（秒），目前约为0.05秒，留出余量避免在较慢的机器上误报
+IMPORT_BUDGET = 0.5
+
+# 只在使用图形界面或处理图像时才能加载的模块
+HEAVY_MODULES = ("PyQt6", "qfluentwidgets", "numpy", "PIL")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import src.core, src.config, src.cli
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def _import_in_subprocess():
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=Path(__file__).resolve().parents[1],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def test_headless_import_skips_heavy_modules():
+    loaded = {name.split(".")[0] for name in _import_in_subprocess()["modules"]}
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_headless_import_within_budget():
+    # 取多次中最快的一次，减少磁盘缓存和调度的影响
+    elapsed = min(_import_in_subprocess()["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET